@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""Benchmarks for fontvalidator.
+
+Generates synthetic subtitle scripts, font directories and Matroska files in a
+temporary directory, times the main stages of validation on them and prints
+the results as JSON. Nothing is downloaded, and the generated files only
+depend on the given parameters and seed.
+
+    python benchmark.py --lines 5000 --font-counts 10,100 --repeat 5 > results.json
+"""
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import struct
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import ebmlite
+from ebmlite.encoding import encodeId, encodeSize, encodeUInt
+from fontTools.fontBuilder import FontBuilder
+from fontTools.pens.ttGlyphPen import TTGlyphPen
+
+import fontvalidator
+
+SCRIPT_KINDS = ("dialogue", "typesetting", "karaoke")
+STYLES = (("Regular", 400, False), ("Bold", 700, False), ("Italic", 400, True), ("Bold Italic", 700, True))
+CHARACTERS = "".join(map(chr, range(0x20, 0x7f))) + "".join(map(chr, range(0xa0, 0x100)))
+WORDS = ("the", "quick", "brown", "fox", "jumps", "over", "lazy", "dog", "señor", "naïve",
+         "café", "Grüße", "hello", "world", "what", "are", "you", "doing", "here", "now")
+
+
+def make_font(family, style, weight, italic, characters):
+    builder = FontBuilder(1000, isTTF=True)
+    glyph_names = {ord(c): f"uni{ord(c):04X}" for c in characters}
+    glyph_order = [".notdef", *glyph_names.values()]
+    builder.setupGlyphOrder(glyph_order)
+    builder.setupCharacterMap(glyph_names)
+
+    pen = TTGlyphPen(None)
+    pen.moveTo((0, 0))
+    pen.lineTo((0, 500))
+    pen.lineTo((500, 500))
+    pen.closePath()
+    glyph = pen.glyph()
+    builder.setupGlyf({name: glyph for name in glyph_order})
+    builder.setupHorizontalMetrics({name: (600, 0) for name in glyph_order})
+    builder.setupHorizontalHeader(ascent=800, descent=-200)
+
+    full_name = f"{family} {style}"
+    builder.setupNameTable({"familyName": family, "styleName": style, "fullName": full_name,
+                            "psName": full_name.replace(" ", "-")})
+    builder.setupOS2(usWeightClass=weight, fsSelection=0b1 if italic else 0b1000000)
+    builder.setupPost()
+    builder.font["head"].macStyle = (0b10 if italic else 0) | (0b1 if weight >= 700 else 0)
+
+    out = io.BytesIO()
+    builder.save(out)
+    return out.getvalue()
+
+def make_font_dir(path, count, rng):
+    """Write count fonts to path, in families of four styles, each covering a
+    random part of CHARACTERS. Returns the family names."""
+    os.makedirs(path, exist_ok=True)
+    families = []
+    for i in range(count):
+        family = f"Bench Family {i // len(STYLES)}"
+        if not families or families[-1] != family:
+            families.append(family)
+        style, weight, italic = STYLES[i % len(STYLES)]
+        characters = CHARACTERS[:rng.randint(len(CHARACTERS) // 2, len(CHARACTERS))]
+        with open(os.path.join(path, f"{family}-{style}.ttf".replace(" ", "")), 'wb') as f:
+            f.write(make_font(family, style, weight, italic, characters))
+    return families
+
+
+def make_text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+def make_event(kind, rng, families):
+    family = rng.choice(families)
+    if kind == "dialogue":
+        text = make_text(rng, rng.randint(4, 12))
+        if rng.random() < 0.2:
+            text = f"{{\\i1}}{text}{{\\i0}}"
+        return rng.choice(("Default", "Alt")), text
+    elif kind == "typesetting":
+        blocks = []
+        for _ in range(rng.randint(2, 6)):
+            blocks.append(f"{{\\an7\\pos({rng.randint(0, 1920)},{rng.randint(0, 1080)})\\fn{family}"
+                          f"\\fs{rng.randint(20, 90)}\\bord{rng.randint(0, 5)}\\blur{rng.random():.1f}"
+                          f"\\c&H{rng.randrange(1 << 24):06X}&\\b{rng.choice((0, 1))}\\i{rng.choice((0, 1))}"
+                          f"\\frz{rng.randint(-30, 30)}\\t(0,200,\\fscx120\\blur2)}}{make_text(rng, 2)}")
+        if rng.random() < 0.1:
+            blocks.append("{\\p1}m 0 0 l 100 0 100 100 0 100{\\p0}")
+        return "Sign", "".join(blocks)
+    else:
+        # karaoke lines repeat the same few tag blocks many times
+        syllables = "".join(f"{{\\k{rng.choice((10, 15, 20, 25))}}}{rng.choice(WORDS)[:3]}"
+                            for _ in range(rng.randint(6, 16)))
+        return "Karaoke", f"{{\\fn{families[0]}\\b1}}{syllables}"
+
+def make_script(kind, lines, families, rng):
+    styles = [("Default", families[0], 0, 0), ("Alt", families[-1], 0, 0),
+              ("Sign", families[len(families) // 2], 0, 0), ("Karaoke", families[0], -1, 0)]
+    out = ["[Script Info]", "ScriptType: v4.00+", "PlayResX: 1920", "PlayResY: 1080", "",
+           "[V4+ Styles]",
+           "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+           "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, "
+           "Shadow, Alignment, MarginL, MarginR, MarginV, Encoding"]
+    for name, font, bold, italic in styles:
+        out.append(f"Style: {name},{font},60,&H00FFFFFF,&H000000FF,&H00000000,&H00000000,"
+                   f"{bold},{italic},0,0,100,100,0,0,1,2,2,2,10,10,10,1")
+    header = "\n".join(out) + "\n"
+
+    events = []
+    for i in range(lines):
+        style, text = make_event(kind, rng, families + ["Missing Family"])
+        start = f"{i // 3600}:{i // 60 % 60:02d}:{i % 60:02d}.00"
+        end = f"{i // 3600}:{i // 60 % 60:02d}:{i % 60:02d}.90"
+        events.append((0, start, end, style, text))
+
+    text = header + "\n[Events]\nFormat: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n"
+    text += "".join(f"Dialogue: {layer},{start},{end},{style},,0,0,0,,{line}\n"
+                    for layer, start, end, style, line in events)
+    return header, events, text
+
+
+class EBMLWriter:
+    # Block and BlockDuration are missing from ebmlite's Matroska schema
+    IDS = {"Block": 0xa1, "BlockDuration": 0x9b}
+
+    def __init__(self, schema):
+        self.schema = schema
+
+    def element(self, name, value):
+        if isinstance(value, list):
+            payload = b"".join(self.element(child, child_value) for child, child_value in value)
+        elif isinstance(value, int):
+            payload = encodeUInt(value)
+        elif isinstance(value, str):
+            payload = value.encode('utf-8')
+        else:
+            payload = value
+        element_id = self.IDS.get(name) or self.schema[name].id
+        return encodeId(element_id) + encodeSize(len(payload)) + payload
+
+def block(track, timestamp, payload):
+    return bytes([0x80 | track]) + struct.pack(">h", timestamp) + b'\x80' + payload
+
+def make_mkv(path, header, events, fontdir, filler, rng):
+    """Write a Matroska file with an ASS track for the given events, the fonts in
+    fontdir attached, and filler bytes of video blocks, indexed by a SeekHead."""
+    writer = EBMLWriter(ebmlite.loadSchema("matroska.xml"))
+
+    clusters = []
+    per_cluster = max(1, len(events) // 50)
+    starts = range(0, max(len(events), 1), per_cluster)
+    filler_blocks = -(-filler // 65536 // len(starts))
+    for start in starts:
+        items = [("Timecode", start * 1000)]
+        for _ in range(filler_blocks):
+            items.append(("SimpleBlock", block(1, 0, rng.randbytes(65536))))
+        for order in range(start, min(start + per_cluster, len(events))):
+            layer, _, _, style, text = events[order]
+            payload = f"{order},{layer},{style},,0,0,0,,{text}".encode('utf-8')
+            if order % 2:
+                items.append(("BlockGroup", [("Block", block(2, 0, payload)), ("BlockDuration", 900)]))
+            else:
+                items.append(("SimpleBlock", block(2, 0, payload)))
+        clusters.append(("Cluster", items))
+
+    attachments = []
+    for i, name in enumerate(sorted(os.listdir(fontdir))):
+        with open(os.path.join(fontdir, name), 'rb') as f:
+            attachments.append(("AttachedFile", [("FileName", name), ("FileMimeType", "font/ttf"),
+                                                 ("FileData", f.read()), ("FileUID", i + 1)]))
+
+    top_level = [("Info", [("TimecodeScale", 1000000), ("MuxingApp", "benchmark"), ("WritingApp", "benchmark")]),
+                 ("Tracks", [("TrackEntry", [("TrackNumber", 1), ("TrackUID", 1), ("TrackType", 1),
+                                             ("CodecID", "V_MPEG4/ISO/AVC")]),
+                             ("TrackEntry", [("TrackNumber", 2), ("TrackUID", 2), ("TrackType", 17),
+                                             ("CodecID", "S_TEXT/ASS"), ("Name", "Benchmark"),
+                                             ("CodecPrivate", header.encode('utf-8'))])]),
+                 ("Attachments", attachments),
+                 *clusters]
+    children = [writer.element(name, value) for name, value in top_level]
+
+    def seekhead(positions):
+        return writer.element("SeekHead", [
+            ("Seek", [("SeekID", writer.schema[name].id.to_bytes(4, 'big')),
+                      ("SeekPosition", position.to_bytes(8, 'big'))])
+            for name, position in positions])
+
+    indexed = ("Info", "Tracks", "Attachments")
+    position = len(seekhead([(name, 0) for name in indexed]))
+    positions = {}
+    for (name, _), child in zip(top_level, children):
+        positions.setdefault(name, position)
+        position += len(child)
+    segment = seekhead([(name, positions[name]) for name in indexed]) + b"".join(children)
+
+    with open(path, 'wb') as f:
+        f.write(writer.element("EBML", [("DocType", "matroska"), ("DocTypeVersion", 4),
+                                        ("DocTypeReadVersion", 2)]))
+        f.write(encodeId(writer.schema["Segment"].id) + encodeSize(len(segment)) + segment)
+
+
+def measure(stage, func, repeat, **params):
+    """Time func over repeat runs, then run it once more under tracemalloc
+    to find its peak memory use."""
+    walls, cpus = [], []
+    for _ in range(repeat):
+        gc.collect()
+        wall, cpu = time.perf_counter(), time.process_time()
+        func()
+        walls.append(time.perf_counter() - wall)
+        cpus.append(time.process_time() - cpu)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    result = {"stage": stage, **params, "runs": repeat,
+              "wall": statistics.median(walls), "wall_min": min(walls),
+              "cpu": statistics.median(cpus), "peak_memory": peak}
+    print(f"{stage} {params}: {result['wall']:.4f}s", file=sys.stderr)
+    return result
+
+def quietly(func):
+    """Run func with its output discarded."""
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return func()
+    return run
+
+def run_benchmarks(args, workdir):
+    rng = random.Random(args.seed)
+    schema = ebmlite.loadSchema("matroska.xml")
+    results = []
+
+    fontdirs = {}
+    families = {}
+    for count in args.font_counts:
+        fontdirs[count] = os.path.join(workdir, f"fonts-{count}")
+        families[count] = make_font_dir(fontdirs[count], count, rng)
+
+        fontlist = fontvalidator.read_font_sources([fontdirs[count]], schema)
+        for lazy in (True, False):
+            results.append(measure("font_collection", quietly(lambda: fontvalidator.FontCollection(
+                fontlist, lazy=lazy)), args.repeat, fonts=count, lazy=lazy))
+
+        index_path = os.path.join(workdir, f"index-{count}.json")
+        quietly(lambda: fontvalidator.FontCollection(fontlist, fontvalidator.FontIndex(index_path)))()
+        results.append(measure("font_collection_indexed", quietly(lambda: fontvalidator.FontCollection(
+            fontlist, fontvalidator.FontIndex(index_path))), args.repeat, fonts=count))
+
+    # validate against the largest font directory
+    count = max(args.font_counts)
+    fonts = quietly(lambda: fontvalidator.FontCollection(
+        fontvalidator.read_font_sources([fontdirs[count]], schema)))()
+
+    scripts = {}
+    for kind in SCRIPT_KINDS:
+        header, events, text = scripts[kind] = make_script(kind, args.lines, families[count], rng)
+        path = os.path.join(workdir, f"{kind}.ass")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+        with open(path, 'r', encoding='utf_8_sig') as f:
+            doc = fontvalidator.ass.parse(f)
+        results.append(measure("ass_parse", lambda: fontvalidator.ass.parse(io.StringIO(text)),
+                               args.repeat, script=kind, lines=args.lines))
+
+        styles = fontvalidator.document_styles(doc)
+        line_styles = [styles[line.style] for line in doc.events]
+
+        def parse_lines(tag_parser=None):
+            for line, style in zip(doc.events, line_styles):
+                for _ in fontvalidator.parse_line(line.text, style, styles, tag_parser):
+                    pass
+
+        results.append(measure("parse_line", quietly(parse_lines), args.repeat,
+                               script=kind, lines=args.lines, cached=False))
+        results.append(measure("parse_line", quietly(lambda: parse_lines(fontvalidator.TagParser(styles))),
+                               args.repeat, script=kind, lines=args.lines, cached=True))
+        results.append(measure("check_fonts", quietly(lambda: fontvalidator.check_fonts(doc, fonts)),
+                               args.repeat, script=kind, lines=args.lines, fonts=count))
+        if args.jobs > 1:
+            results.append(measure("check_fonts", quietly(lambda: fontvalidator.check_fonts(
+                doc, fonts, jobs=args.jobs)), args.repeat, script=kind, lines=args.lines, fonts=count,
+                jobs=args.jobs))
+
+    font = fonts.fonts[0]
+    font.load()
+    texts = [text for _, _, _, _, text in scripts["dialogue"][1]]
+    results.append(measure("missing_glyphs", lambda: [font.missing_glyphs(text) for text in texts],
+                           args.repeat, lines=len(texts)))
+
+    # attach the smallest font directory
+    header, events, _ = scripts["dialogue"]
+    count = min(args.font_counts)
+    mkv_path = os.path.join(workdir, "dialogue.mkv")
+    make_mkv(mkv_path, header, events, fontdirs[count], args.mkv_filler << 20, rng)
+    for streaming in (False, True):
+        results.append(measure("read_subtitles", quietly(lambda: fontvalidator.read_subtitles(
+            mkv_path, schema, streaming)), args.repeat, lines=args.lines, attachments=count,
+            size=os.path.getsize(mkv_path), streaming=streaming))
+        results.append(measure("get_fonts", quietly(lambda: fontvalidator.get_fonts(
+            schema.load(mkv_path), streaming)), args.repeat, attachments=count, streaming=streaming))
+
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fontvalidator on synthetic files.")
+    parser.add_argument('--lines', type=int, default=5000,
+                        help="Number of lines in each generated script (default: 5000).")
+    parser.add_argument('--font-counts', type=lambda s: [int(x) for x in s.split(',')], default=[10, 100],
+                        metavar='N,...', help="Sizes of the generated font directories (default: 10,100).")
+    parser.add_argument('--mkv-filler', type=int, default=16, metavar='MB',
+                        help="Megabytes of video data in the generated Matroska file (default: 16).")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="Number of timed runs of each stage (default: 3).")
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help="Also benchmark parallel validation with N processes.")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for generating the files.")
+    parser.add_argument('--workdir', help="""
+Directory to generate the files in. A temporary directory is used if not given.
+""")
+    parser.add_argument('-o', '--output', help="File to write the results to instead of stdout.")
+    args = parser.parse_args()
+
+    if args.workdir is not None:
+        results = run_benchmarks(args, args.workdir)
+    else:
+        with tempfile.TemporaryDirectory() as workdir:
+            results = run_benchmarks(args, workdir)
+
+    report = {"python": platform.python_version(), "platform": platform.platform(),
+              "parameters": {key: value for key, value in vars(args).items() if key != "output"},
+              "results": results}
+    if args.output is not None:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1)
+    else:
+        json.dump(report, sys.stdout, indent=1)
+        print()
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,60 @@
-
 import argparse
+import bisect
 import collections
+import concurrent.futures
+import contextlib
+import cProfile
+import functools
+import glob
+import hashlib
 import io
 import itertools
+import json
 import logging
+import mmap
+import os
 import os.path
 import pathlib
 import re
 import sys
+import time
 import zlib
 
 import ass
 import ebmlite
+from fontTools import subset
 from fontTools.ttLib import ttFont
 from fontTools.misc import encodingTools
 
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
 logging.basicConfig(format="%(name)s: %(message)s")
 
-TAG_PATTERN = re.compile(r"\\\s*([^(\\]+)(?<!\s)\s*(?:\(\s*([^)]+)(?<!\s)\s*)?")
+# captures the tag, the name of the tag if it is one that affects font selection
+# (\blur, \be, \bord, \iclip, \pos and \pbo are not \b, \i or \p), and the
+# parenthesized argument
+TAG_PATTERN = re.compile(r"\\\s*((fn|b(?!lur|e|ord)|i(?!clip)|p(?!os|bo)|r|t)?[^(\\]*)(?<![\s\\])"
+                         r"\s*(?:\(\s*([^)]+)(?<!\s)\s*)?")
 INT_PATTERN = re.compile(r"^[+-]?\d+")
 LINE_PATTERN = re.compile(r"(?:\{(?P<tags>[^}]*)\}?)?(?P<text>[^{]*)")
 TEXT_WHITESPACE_PATTERN = re.compile(r"\\[nNh]")
+# a section header line, preceded by a newline
+SECTION_PATTERN = re.compile(r"\n[^\S\n]*\[([^\n]*)\][^\S\n]*(?=\n|$)")
+# minimum number of lines per process when validating in parallel
+PARALLEL_CHUNK_SIZE = 2000
+# seconds between checking for changes in watch mode
+WATCH_INTERVAL = 0.1
+RESOLUTIONS_VERSION = 1
+# fields of the events stored in Matroska blocks, after the ReadOrder
+BLOCK_FIELD_ORDER = ("Layer", "Style", "Name", "MarginL", "MarginR", "MarginV", "Effect", "Text")
 
 State = collections.namedtuple("State", ["font", "italic", "weight", "drawing"])
+# assumed for lines with an unknown style
+DEFAULT_STYLE = State("Arial", False, 400, False)
 
 def parse_int(s):
     if match := INT_PATTERN.match(s):
@@ -36,29 +68,24 @@ def strip_fontname(s):
     else:
         return s
 
-def parse_tags(s, state, line_style, styles):
-    for match in TAG_PATTERN.finditer(s):
-        value, paren = match.groups()
-
-        def get_tag(name, *exclude):
-            if value.startswith(name) and not any(value.startswith(ex) for ex in exclude):
-                args = []
-                if paren is not None:
-                    args.append(paren)
-                if len(stripped := value[len(name):].lstrip()) > 0:
-                    args.append(stripped)
-                return args
-            else:
-                return None
+def parse_tags(s, state, line_style, styles, warnings=None):
+    """Return the state after the override tags in s. Warnings are printed,
+    or appended to the list warnings if given."""
+    for value, name, paren in TAG_PATTERN.findall(s):
+        if not name:
+            continue
 
+        args = [paren] if paren else []
+        if len(stripped := value[len(name):].lstrip()) > 0:
+            args.append(stripped)
 
-        if (args := get_tag("fn")) is not None:
+        if name == "fn":
             if len(args) == 0:
                 font = line_style.font
             else:
                 font = strip_fontname(args[0])
             state = state._replace(font=font)
-        elif (args := get_tag("b", "blur", "be", "bord")) is not None:
+        elif name == "b":
             weight = None if len(args) == 0 else parse_int(args[0])
             if weight is None:
                 transformed = None
@@ -72,51 +99,117 @@ def parse_tags(s, state, line_style, styles):
                 transformed = None
 
             state = state._replace(weight=transformed or line_style.weight)
-        elif (args := get_tag("i", "iclip")) is not None:
+        elif name == "i":
             slant = None if len(args) == 0 else parse_int(args[0])
             state = state._replace(italic=slant == 1 if slant in (0, 1) else line_style.italic)
-        elif (args := get_tag("p", "pos", "pbo")) is not None:
+        elif name == "p":
             scale = 0 if len(args) == 0 else parse_int(args[0])
             state = state._replace(drawing=scale != 0)
-        elif (args := get_tag("r")) is not None:
+        elif name == "r":
             if len(args) == 0:
                 style = line_style
             else:
                 if (style := styles.get(args[0])) is None:
-                    print(rf"Warning: \r argument {args[0]} does not exist; defaulting to line style")
+                    warning = rf"Warning: \r argument {args[0]} does not exist; defaulting to line style"
+                    if warnings is None:
+                        print(warning)
+                    else:
+                        warnings.append(warning)
                     style = line_style
             state = state._replace(font=style.font, italic=style.italic, weight=style.weight)
-        elif (args := get_tag("t")) is not None:
+        elif name == "t":
             if len(args) > 0:
-                state = parse_tags(args[0], state, line_style, styles)
+                state = parse_tags(args[0], state, line_style, styles, warnings)
 
     return state
 
 def parse_text(text):
     return TEXT_WHITESPACE_PATTERN.sub(' ', text)
 
-def parse_line(line, line_style, styles):
+class TagParser:
+    """Parses override tag blocks for a set of styles, remembering the state
+    resulting from the most recently used (tag block, state, line style)
+    combinations. Warnings are printed again whenever a block is reused."""
+
+    def __init__(self, styles, maxsize=4096):
+        self.styles = styles
+        self._parse = functools.lru_cache(maxsize)(self._parse_uncached)
+
+    def _parse_uncached(self, tags, state, line_style):
+        warnings = []
+        state = parse_tags(tags, state, line_style, self.styles, warnings)
+        return state, tuple(warnings)
+
+    def __call__(self, tags, state, line_style):
+        state, warnings = self._parse(tags, state, line_style)
+        for warning in warnings:
+            print(warning)
+        return state
+
+    def cache_info(self):
+        """Return the hits, misses, maxsize and current size of the cache."""
+        return self._parse.cache_info()
+
+def parse_line(line, line_style, styles, tag_parser=None):
     state = line_style
     for tags, text in LINE_PATTERN.findall(line):
         if len(tags) > 0:
-            state = parse_tags(tags, state, line_style, styles)
+            if tag_parser is not None:
+                state = tag_parser(tags, state, line_style)
+            else:
+                state = parse_tags(tags, state, line_style, styles)
         if len(text) > 0:
             yield state, parse_text(text)
 
 
 class Font:
-    def __init__(self, fontfile, font_number=0):
+    # attributes stored in the font index; everything else is derived from these
+    INFO_FIELDS = ("num_fonts", "postscript", "weight", "italic",
+                   "family_names", "full_names", "postscript_name")
+
+    def __init__(self, fontfile, font_number=0, name=None, lazy=False):
         self.fontfile = fontfile
-        self.font = ttFont.TTFont(fontfile, fontNumber=font_number)
+        self.font_number = font_number
+        self.name = name if name is not None else str(fontfile)
+
+        if lazy:
+            # only read the name, OS/2 and head tables needed for matching;
+            # the glyph tables are read by load() once the font is used
+            with self._open() as f:
+                self.font = ttFont.TTFont(f, fontNumber=font_number, lazy=True)
+                self._read_metadata()
+            self.font = None
+            self.loaded = False
+        else:
+            self.font = self._ttfont()
+            self.glyphs = self.font.getGlyphSet()
+            self._read_metadata()
+
+            # fail early if glyph tables can't be accessed
+            self.charset = self._read_charset()
+            self.loaded = True
+
+        self.coverage_ranges = None
+
+    def _ttfont(self):
+        # fonts held in memory (or mapped from an MKV) are read on demand
+        # instead of being copied into a new buffer by fontTools
+        return ttFont.TTFont(self.fontfile, fontNumber=self.font_number,
+                             lazy=None if isinstance(self.fontfile, str) else True)
+
+    def _open(self):
+        if isinstance(self.fontfile, str):
+            return open(self.fontfile, 'rb')
+        else:
+            return contextlib.nullcontext(self.fontfile)
+
+    def _read_metadata(self):
         self.num_fonts = getattr(self.font.reader, "numFonts", 1)
         self.postscript = self.font.has_key("CFF ")
-        self.glyphs = self.font.getGlyphSet()
 
         os2 = self.font["OS/2"]
         self.weight = os2.usWeightClass
         self.italic = os2.fsSelection & 0b1 > 0
-        self.slant = self.italic * 110
-        self.width = 100
 
         self.names = [name for name in self.font["name"].names
                       if name.platformID == 3 and name.platEncID in (0, 1)]
@@ -136,63 +229,333 @@ class Font:
                         [(1, 0, 0), (3, 1, 0x409)]:
                     break
 
-        exact_names = [self.postscript_name] if (self.postscript and self.postscript_name) else self.full_names
-        self.exact_names = [name for name in exact_names
-                            if all(name.lower() != family.lower() for family in self.family_names)]
+        self._init_derived()
 
         mac_italic = self.font["head"].macStyle & 0b10 > 0
         if mac_italic != self.italic:
             print(f"warning: different italic values in macStyle and fsSelection for font {self.postscript_name}")
 
-        # fail early if glyph tables can't be accessed
-        self.missing_glyphs('')
+    def load(self):
+        """Read the glyph coverage of a lazily loaded font.
+        Raises an exception if the glyph tables can't be accessed."""
+        if self.loaded:
+            return
 
-    def missing_glyphs(self, text):
+        if self.coverage_ranges is not None:
+            self.charset = frozenset(chr(cp) for start, end in self.coverage_ranges
+                                     for cp in range(start, end + 1))
+            self.loaded = True
+            return
+
+        self.font = self._ttfont()
+        try:
+            self.glyphs = self.font.getGlyphSet()
+            self.charset = self._read_charset()
+        except Exception:
+            self.font = None
+            raise
+        self.loaded = True
+
+    def _read_charset(self):
         if (uniTable := self.font.getBestCmap()):
-            return [c for c in text
-                    if ord(c) not in uniTable]
+            return frozenset(map(chr, uniTable))
         elif (symbolTable := self.font["cmap"].getcmap(3, 0)):
+            # symbol fonts map the bytes of the Mac encoding to U+F000-U+F0FF
             macTable = self.font["cmap"].getcmap(1, 0)
             encoding = encodingTools.getEncoding(1, 0, macTable.language) if macTable else 'mac_roman'
-            missing = []
-            for c in text:
-                try:
-                    if (c.encode(encoding)[0] + 0xf000) not in symbolTable.cmap:
-                        missing.append(c)
-                except UnicodeEncodeError:
-                    missing.append(c)
-            return missing
+            charset = set()
+            for byte in range(256):
+                if byte + 0xf000 in symbolTable.cmap:
+                    try:
+                        charset.update(bytes([byte]).decode(encoding))
+                    except UnicodeDecodeError:
+                        pass
+            return frozenset(charset)
         else:
             print(f"warning: could not read glyphs for font {self}")
+            return None
+
+    def _init_derived(self):
+        self.slant = self.italic * 110
+        self.width = 100
+
+        exact_names = [self.postscript_name] if (self.postscript and self.postscript_name) else self.full_names
+        self.exact_names = [name for name in exact_names
+                            if all(name.lower() != family.lower() for family in self.family_names)]
+
+    @classmethod
+    def from_info(cls, fontfile, font_number, info, name=None):
+        """Construct a font from metadata previously returned by Font.info,
+        without parsing the font file."""
+        font = cls.__new__(cls)
+        font.fontfile = fontfile
+        font.font_number = font_number
+        font.name = name if name is not None else str(fontfile)
+        font.font = None
+        font.loaded = False
+        for field in cls.INFO_FIELDS:
+            setattr(font, field, info[field])
+        font.coverage_ranges = info["coverage"]
+        font._init_derived()
+        return font
+
+    def info(self):
+        """Return the metadata needed to reconstruct this font as a JSON-serializable dict."""
+        info = {field: getattr(self, field) for field in self.INFO_FIELDS}
+
+        self.load()
+        if self.charset is None:
+            info["coverage"] = None
+        else:
+            # store as inclusive ranges to keep the index compact
+            ranges = []
+            for cp in sorted(map(ord, self.charset)):
+                if ranges and ranges[-1][1] == cp - 1:
+                    ranges[-1][1] = cp
+                else:
+                    ranges.append([cp, cp])
+            info["coverage"] = ranges
+
+        return info
+
+    def missing_glyphs(self, text):
+        """Return the set of characters in text (any iterable of characters)
+        not covered by the font, or None if the glyph tables could not be read."""
+        self.load()
+        if self.charset is None:
+            return None
+        return set(text).difference(self.charset)
+
+    def __getstate__(self):
+        # TTFont objects can't be sent to worker processes, but loaded fonts
+        # only need their charset; unloaded fonts are read again on demand
+        state = self.__dict__.copy()
+        state["font"] = None
+        state.pop("glyphs", None)
+        return state
 
     def __repr__(self):
         return f"{self.postscript_name}(italic={self.italic}, weight={self.weight})"
 
 
+class FontIndex:
+    """Persistent on-disk cache of font metadata.
+
+    Font files are keyed by their absolute path and validated against
+    their size and modification time; in-memory fonts (e.g. MKV attachments)
+    are keyed by a hash of their contents. Entries of in-memory fonts that
+    were not looked up since the last save, and of font files that no longer
+    exist, are dropped when saving. If path is None, the index is only kept
+    in memory."""
+
+    VERSION = 1
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+        # keys looked up or added since the last save
+        self.seen = set()
+
+        if path is None:
+            return
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") == self.VERSION:
+                self.entries = data["files"]
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, AttributeError) as e:
+            print(f"Warning: Ignoring invalid font index {path}: {e}")
+
+    @staticmethod
+    def _key(fontfile):
+        if not isinstance(fontfile, str):
+            return "sha1:" + hashlib.sha1(fontfile.getbuffer()).hexdigest(), None
+
+        path = os.path.abspath(fontfile)
+        stat = os.stat(path)
+        return path, [stat.st_size, stat.st_mtime_ns]
+
+    def get(self, fontfile):
+        """Return the list of face infos for the given font file,
+        or None if the file is not indexed or has changed."""
+        key, stamp = self._key(fontfile)
+        self.seen.add(key)
+        if (entry := self.entries.get(key)) is not None and entry["stamp"] == stamp:
+            return entry["faces"]
+        return None
+
+    def put(self, fontfile, faces):
+        key, stamp = self._key(fontfile)
+        self.seen.add(key)
+        self.entries[key] = {"stamp": stamp, "faces": faces}
+        self.dirty = True
+
+    def prune(self):
+        """Drop the entries of in-memory fonts not looked up since the last save,
+        and of font files that no longer exist."""
+        stale = [key for key in self.entries if key not in self.seen and
+                 (key.startswith("sha1:") or not os.path.exists(key))]
+        for key in stale:
+            del self.entries[key]
+        self.seen = set()
+        self.dirty = self.dirty or len(stale) > 0
+
+    def save(self):
+        self.prune()
+        if not self.dirty or self.path is None:
+            return
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": self.VERSION, "files": self.entries}, f)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+
+def read_faces(name, fontfile, lazy=False):
+    """Read every face in a font file.
+
+    Returns the faces that could be read, along with the exception that
+    stopped reading, if any."""
+    faces = []
+    try:
+        font = Font(fontfile, name=name, lazy=lazy)
+        faces.append(font)
+        for i in range(1, font.num_fonts):
+            faces.append(Font(fontfile, font_number=i, name=name, lazy=lazy))
+    except Exception as e:
+        return faces, e
+    return faces, None
+
+def read_face_infos(name, fontfile):
+    """Process pool variant of timed_read_faces, returning picklable metadata
+    records and any output printed while parsing."""
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        faces, error, seconds = timed_read_faces(name, fontfile)
+    return [face.info() for face in faces], None if error is None else str(error), out.getvalue(), seconds
+
+def timed_read_faces(name, fontfile, lazy=False):
+    """read_faces, also returning the number of seconds it took."""
+    start = time.perf_counter()
+    return *read_faces(name, fontfile, lazy), time.perf_counter() - start
+
+
+class FontFamily:
+    """The faces of a font family in the order they were added, indexed by
+    slant and weight to find the face most similar to a requested style
+    (as given by FontCollection.similarity) without comparing every face."""
+
+    def __init__(self, fonts=None):
+        self.fonts = [] if fonts is None else fonts
+        self._index = None
+
+    def __len__(self):
+        return len(self.fonts)
+
+    def __iter__(self):
+        return iter(self.fonts)
+
+    def _build_index(self):
+        # for each slant, the distinct weights in ascending order along with
+        # the first face (and its position) with each weight, so that ties are
+        # broken in favor of the face that was added first
+        by_slant = {}
+        for position, font in enumerate(self.fonts):
+            by_slant.setdefault(font.slant, {}).setdefault(font.weight, (position, font))
+
+        self._index = []
+        for slant, faces in by_slant.items():
+            weights = sorted(faces)
+            self._index.append((slant, weights, [faces[weight] for weight in weights]))
+
+    def closest(self, state):
+        if self._index is None:
+            self._build_index()
+
+        best = None
+        for slant, weights, faces in self._index:
+            i = bisect.bisect_left(weights, state.weight)
+            for j in (i - 1, i):
+                if 0 <= j < len(weights):
+                    position, font = faces[j]
+                    candidate = (abs(state.weight - weights[j]) + abs(state.italic * 100 - slant), position, font)
+                    if best is None or candidate[:2] < best[:2]:
+                        best = candidate
+        return best[2]
+
+
 class FontCollection:
-    def __init__(self, fontfiles):
-        self.fonts = []
-        for name, f in fontfiles:
+    def __init__(self, fontfiles, index=None, jobs=1, lazy=False):
+        fontfiles = list(fontfiles)
+
+        def lookup(f):
             try:
-                font = Font(f)
-                self.fonts.append(font)
-                if font.num_fonts > 1:
-                    for i in range(1, font.num_fonts):
-                        self.fonts.append(Font(f, font_number=i))
-            except Exception as e:
-                print(f"Error reading {name}: {e}")
+                return index.get(f)
+            except Exception:
+                # let the parser report the error
+                return None
+
+        indexed = [lookup(f) if index is not None else None for _, f in fontfiles]
+        to_parse = [(name, f) for (name, f), faces in zip(fontfiles, indexed) if faces is None]
 
+        if jobs > 1 and len(to_parse) > 1:
+            executor = concurrent.futures.ProcessPoolExecutor(jobs)
+            parsed = executor.map(read_face_infos, *zip(*to_parse))
+        else:
+            # fonts are read in full when adding them to the index
+            executor = None
+            parsed = (timed_read_faces(name, f, lazy=lazy and index is None) for name, f in to_parse)
+
+        self.fonts = []
+        # seconds spent reading each font file, for --timings
+        self.parse_times = collections.defaultdict(float)
+        self.files_parsed = len(to_parse)
+        self.hits = self.misses = 0
+        try:
+            for (name, f), faces in zip(fontfiles, indexed):
+                if faces is not None:
+                    self.fonts.extend(Font.from_info(f, i, info, name=name)
+                                      for i, info in enumerate(faces))
+                    continue
+
+                if executor is None:
+                    faces, error, seconds = next(parsed)
+                else:
+                    infos, error, output, seconds = next(parsed)
+                    print(output, end='')
+                    faces = [Font.from_info(f, i, info, name=name) for i, info in enumerate(infos)]
+                self.parse_times[name] += seconds
+
+                self.fonts.extend(faces)
+                if error is not None:
+                    print(f"Error reading {name}: {error}")
+                elif index is not None:
+                    index.put(f, infos if executor is not None else [face.info() for face in faces])
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        if index is not None:
+            index.save()
+
+        # matches read with import_resolutions, used instead of _match
+        self.resolved = {}
+        self._build_maps()
+
+    def _build_maps(self):
         self.cache = {}
         self.by_full = {name.lower(): font
                         for font in self.fonts
                         for name in font.exact_names}
-        self.by_family = {name.lower(): [font for (_, font) in fonts]
-                          for name, fonts in itertools.groupby(
-                              sorted([(family, font)
-                                      for font in self.fonts
-                                      for family in font.family_names],
-                                     key=lambda x: x[0]),
-                              key=lambda x: x[0])}
+        self.by_family = {}
+        for font in self.fonts:
+            for family in font.family_names:
+                self.by_family.setdefault(family.lower(), FontFamily()).fonts.append(font)
 
     def similarity(self, state, font):
         return abs(state.weight - font.weight) + abs(state.italic * 100 - font.slant)
@@ -201,72 +564,444 @@ class FontCollection:
         if (exact := self.by_full.get(state.font)):
             return exact, True
         elif (family := self.by_family.get(state.font)):
-            return min(family, key=lambda font: self.similarity(state, font)), False
+            return family.closest(state), False
         else:
             return None, False
 
+    def _load(self, font):
+        start = time.perf_counter()
+        try:
+            font.load()
+            return True
+        except Exception as e:
+            print(f"Error reading {font.name}: {e}")
+            # drop the font and fall back to the next best match
+            self.fonts.remove(font)
+            cache = self.cache
+            self._build_maps()
+            self.cache = cache
+            return False
+        finally:
+            self.parse_times[font.name] += time.perf_counter() - start
+
     def match(self, state):
         s = state._replace(font=state.font.lower(), drawing=False)
-        try:
-            return self.cache[s]
-        except KeyError:
-            font = self._match(s)
-            self.cache[s] = font
+        if (font := self.cache.get(s)) is not None:
+            self.hits += 1
             return font
 
+        self.misses += 1
+        font = self.resolved.pop(s, None) or self._match(s)
+        while font[0] is not None and not self._load(font[0]):
+            font = self._match(s)
+        self.cache[s] = font
+        return font
+
+    def fingerprint(self):
+        """Return a hash identifying the fonts in this collection and their metadata."""
+        fonts = [[font.name, font.font_number, *(getattr(font, field) for field in Font.INFO_FIELDS)]
+                 for font in self.fonts]
+        return hashlib.sha1(json.dumps(fonts).encode('utf-8')).hexdigest()
+
+    def resolutions(self):
+        """Return the fonts matched so far as a list of JSON-serializable dicts,
+        giving the requested font name, weight and italic, and the file and face
+        index of the matched font, whether it was an exact or a family match,
+        and its similarity to the request (0 being identical)."""
+        table = []
+        for state, (font, exact) in self.cache.items():
+            entry = {"font": state.font, "weight": state.weight, "italic": state.italic}
+            if font is None:
+                entry.update({"file": None, "index": None, "match": None, "similarity": None})
+            else:
+                entry.update({"file": font.name, "index": font.font_number,
+                              "match": "exact" if exact else "family",
+                              "similarity": self.similarity(state, font)})
+            table.append(entry)
+        return sorted(table, key=lambda entry: (entry["font"], entry["weight"], entry["italic"]))
+
+    def import_resolutions(self, table):
+        """Use the matches in a table from resolutions() instead of matching
+        the requested fonts again. The table must have been created for the same fonts."""
+        fonts = {}
+        for font in self.fonts:
+            fonts.setdefault((font.name, font.font_number), font)
+
+        for entry in table:
+            state = State(entry["font"], entry["italic"], entry["weight"], False)
+            if entry["match"] is None:
+                self.resolved[state] = None, False
+            elif (font := fonts.get((entry["file"], entry["index"]))) is not None:
+                self.resolved[state] = font, entry["match"] == "exact"
+
+
+class OverlayFontCollection(FontCollection):
+    """A collection of fonts layered over a shared base collection,
+    e.g. the fonts attached to a single MKV over a shared font directory.
+
+    Matches are the same as for a single collection created from the overlay's
+    font files followed by the base's. The base is not modified, and its match
+    cache stays valid for every font name the overlay doesn't provide."""
+
+    def __init__(self, fontfiles, base, index=None, jobs=1, lazy=False):
+        self.base = base
+        super().__init__(fontfiles, index, jobs=jobs, lazy=lazy)
 
-def validate_fonts(doc, fonts, ignore_drawings=False, warn_on_exact=False):
-    report = {
+    def _match(self, state):
+        if (exact := self.by_full.get(state.font)):
+            return exact, True
+        elif (family := FontFamily([*self.by_family.get(state.font, []),
+                                    *self.base.by_family.get(state.font, [])])):
+            return family.closest(state), False
+        else:
+            return None, False
+
+    def _load(self, font):
+        if font in self.fonts:
+            return super()._load(font)
+        return self.base._load(font)
+
+    def match(self, state):
+        name = state.font.lower()
+        if name in self.base.by_full or (name not in self.by_full and name not in self.by_family):
+            return self.base.match(state)
+        return super().match(state)
+
+
+def get_line_style(nline, style_name, styles):
+    try:
+        return styles[style_name]
+    except KeyError:
+        print(f"Warning: Unknown style {style_name} on line {nline}; assuming default style")
+        return DEFAULT_STYLE
+
+def parse_event(nline, style_name, text, styles, tag_parser):
+    yield from parse_line(text, get_line_style(nline, style_name, styles), styles, tag_parser)
+
+def _parse_events_chunk(events, styles):
+    """Parse a chunk of events in a worker process. Returns the line number
+    and a list of (state, text) segments for each line, with anything printed
+    while parsing inserted as strings where it was printed, and the cache
+    hits and misses of the TagParser used."""
+    tag_parser = TagParser(styles)
+    out = io.StringIO()
+    parsed = []
+
+    def flush(segments):
+        if out.tell() > 0:
+            segments.append(out.getvalue())
+            out.seek(0)
+            out.truncate()
+
+    with contextlib.redirect_stdout(out):
+        for nline, style_name, text in events:
+            segments = []
+            for segment in parse_event(nline, style_name, text, styles, tag_parser):
+                flush(segments)
+                segments.append(segment)
+            flush(segments)
+            parsed.append((nline, segments))
+
+    info = tag_parser.cache_info()
+    return parsed, (info.hits, info.misses)
+
+def parse_events_parallel(events, styles, jobs, tag_stats=None):
+    """Parse the override tags of (line number, style name, text) events using
+    a pool of processes, yielding the results of _parse_events_chunk in order.
+    The tag cache hits and misses are added to the Counter tag_stats if given."""
+    chunk_size = max(PARALLEL_CHUNK_SIZE, -(-len(events) // (jobs * 4)))
+    chunks = [events[i:i + chunk_size] for i in range(0, len(events), chunk_size)]
+    with concurrent.futures.ProcessPoolExecutor(min(jobs, len(chunks))) as executor:
+        for parsed, (hits, misses) in executor.map(_parse_events_chunk, chunks, itertools.repeat(styles)):
+            if tag_stats is not None:
+                tag_stats.update(hits=hits, misses=misses)
+            yield from parsed
+
+def document_styles(doc):
+    return {style.name: State(strip_fontname(style.fontname), style.italic, 700 if style.bold else 400, False)
+            for style in doc.styles}
+
+def new_report():
+    return {
         "missing_font": collections.defaultdict(set),
         "missing_glyphs": collections.defaultdict(set),
         "missing_glyphs_lines": collections.defaultdict(set),
         "faux_bold": collections.defaultdict(set),
         "faux_italic": collections.defaultdict(set),
         "mismatch_bold": collections.defaultdict(set),
-        "mismatch_italic": collections.defaultdict(set)
+        "mismatch_italic": collections.defaultdict(set),
+        "used_chars": collections.defaultdict(set)
     }
 
-    styles = {style.name: State(strip_fontname(style.fontname), style.italic, 700 if style.bold else 400, False)
-              for style in doc.styles}
-    for i, line in enumerate(doc.events):
-        if isinstance(line, ass.Comment):
+def check_line(segments, fonts, ignore_drawings=False, warn_on_exact=False):
+    """Check the (state, text) segments of a single line.
+
+    Returns the issues found as (report category, key) pairs, and the
+    characters used with each (requested font name, resolved font) pair."""
+    issues = []
+    line_chars = collections.defaultdict(set)
+    for segment in segments:
+        if isinstance(segment, str):
+            # output from a worker process
+            print(segment, end='')
             continue
-        nline = i + 1
-
-        try:
-            style = styles[line.style]
-        except KeyError:
-            print(f"Warning: Unknown style {line.style} on line {nline}; assuming default style")
-            style = State("Arial", False, 400, False)
 
-        for state, text in parse_line(line.text, style, styles):
-            font, exact_match = fonts.match(state)
+        state, text = segment
+        font, exact_match = fonts.match(state)
 
-            if ignore_drawings and state.drawing:
-                continue
-
-            if font is None:
-                report["missing_font"][state.font].add(nline)
-                continue
-
-            if state.weight >= font.weight + 150:
-                report["faux_bold"][state.font, state.weight, font.weight].add(nline)
-
-            if state.weight <= font.weight - 150 and (not exact_match or warn_on_exact):
-                report["mismatch_bold"][state.font, state.weight, font.weight].add(nline)
-
-            if state.italic and not font.italic:
-                report["faux_italic"][state.font].add(nline)
-
-            if not state.italic and font.italic and (not exact_match or warn_on_exact):
-                report["mismatch_italic"][state.font].add(nline)
+        if ignore_drawings and state.drawing:
+            continue
 
-            if not state.drawing:
-                missing = font.missing_glyphs(text)
-                report["missing_glyphs"][state.font].update(missing)
-                if len(missing) > 0:
-                    report["missing_glyphs_lines"][state.font].add(nline)
+        if font is None:
+            issues.append(("missing_font", state.font))
+            continue
 
+        if state.weight >= font.weight + 150:
+            issues.append(("faux_bold", (state.font, state.weight, font.weight, font)))
+
+        if state.weight <= font.weight - 150 and (not exact_match or warn_on_exact):
+            issues.append(("mismatch_bold", (state.font, state.weight, font.weight, font)))
+
+        if state.italic and not font.italic:
+            issues.append(("faux_italic", (state.font, font)))
+
+        if not state.italic and font.italic and (not exact_match or warn_on_exact):
+            issues.append(("mismatch_italic", (state.font, font)))
+
+        if not state.drawing:
+            line_chars[state.font, font].update(text)
+
+    return issues, line_chars
+
+def add_line(report, used_chars, nline, issues, line_chars):
+    """Add the result of check_line for line nline to a report."""
+    for category, key in issues:
+        report[category][key].add(nline)
+    for key, chars in line_chars.items():
+        used_chars[key].append((nline, chars))
+
+def check_coverage(report, used_chars):
+    """Add the missing glyphs to a report, given the characters used with each
+    (requested font name, resolved font) pair as lists of (line number, characters)."""
+    for key, lines in used_chars.items():
+        used = set().union(*(chars for _, chars in lines))
+        report["used_chars"][key[1]].update(used)
+        if missing := key[1].missing_glyphs(used):
+            report["missing_glyphs"][key].update(missing)
+            report["missing_glyphs_lines"][key].update(
+                nline for nline, chars in lines if not missing.isdisjoint(chars))
+
+def check_fonts(doc, fonts, ignore_drawings=False, warn_on_exact=False, tag_parser=None, jobs=1,
+                tag_stats=None):
+    """Check the font usage of a subtitle document.
+
+    Returns a report mapping each category of issue to a dict from
+    (requested font name, [requested weight, resolved weight,] resolved font)
+    to the set of affected line numbers. Missing fonts are keyed by name only,
+    and "missing_glyphs" maps to the sets of missing characters instead.
+    "used_chars" maps each resolved font to the characters used with it.
+
+    Override tags are parsed with tag_parser, which must be a TagParser for
+    the document's styles; a new one is created if not given. If jobs > 1,
+    the tags of large documents are instead parsed in chunks by that many
+    processes, while fonts are still resolved in this process so that the
+    result and output are the same. The hits and misses of the tag cache
+    are added to the Counter tag_stats if given."""
+    report = new_report()
+
+    # characters used with each (requested font, resolved font) pair, per line;
+    # coverage is checked once for all distinct characters after the scan
+    used_chars = collections.defaultdict(list)
+
+    styles = document_styles(doc)
+    if tag_parser is None:
+        tag_parser = TagParser(styles)
+
+    events = [(i + 1, line.style, line.text) for i, line in enumerate(doc.events)
+              if not isinstance(line, ass.Comment)]
+    parallel = jobs > 1 and len(events) > PARALLEL_CHUNK_SIZE
+    before = tag_parser.cache_info()
+    if parallel:
+        lines = parse_events_parallel(events, styles, jobs, tag_stats)
+    else:
+        lines = ((nline, parse_event(nline, style, text, styles, tag_parser))
+                 for nline, style, text in events)
+
+    for nline, segments in lines:
+        add_line(report, used_chars, nline, *check_line(segments, fonts, ignore_drawings, warn_on_exact))
+
+    if tag_stats is not None and not parallel:
+        after = tag_parser.cache_info()
+        tag_stats.update(hits=after.hits - before.hits, misses=after.misses - before.misses)
+
+    check_coverage(report, used_chars)
+    return report
+
+# report categories mapping to sets of line numbers
+LINE_CATEGORIES = ("missing_font", "faux_bold", "faux_italic", "mismatch_bold",
+                   "mismatch_italic", "missing_glyphs_lines")
+
+class IncrementalChecker:
+    """Checks successive versions of a subtitle document against the same
+    fonts. The report is kept between versions and only updated for the
+    events that were added or removed, found by comparing the event objects
+    with those of the previous version (see CachingParser), and the results
+    of lines checked in recent versions are reused. Output printed while
+    checking a line is printed again whenever the line is reused."""
+
+    def __init__(self, fonts, ignore_drawings=False, warn_on_exact=False):
+        self.fonts = fonts
+        self.ignore_drawings = ignore_drawings
+        self.warn_on_exact = warn_on_exact
+        self.styles = None
+
+    def _reset(self, styles):
+        self.styles = styles
+        self.tag_parser = TagParser(styles)
+        # results by (line style, text), least recently used first
+        self.results = {}
+        # the events of the previous version, and for each event None if it
+        # is a comment, or its style name if unknown (else None) and its result
+        self.events = []
+        self.rows = []
+        # the line number categories of the report
+        self.lines = {category: collections.defaultdict(set) for category in LINE_CATEGORIES}
+        # how many lines use each character with each (requested font name,
+        # resolved font) pair, and each character missing from the font
+        self.chars = collections.defaultdict(collections.Counter)
+        self.missing = collections.defaultdict(collections.Counter)
+        # number of rows printing something
+        self.noisy = 0
+
+    def _row(self, line):
+        if isinstance(line, ass.Comment):
+            return None
+
+        unknown = None
+        if (style := self.styles.get(line.style)) is None:
+            unknown, style = line.style, DEFAULT_STYLE
+
+        key = style, line.text
+        if (result := self.results.pop(key, None)) is None:
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                issues, line_chars = check_line(parse_line(line.text, style, self.styles, self.tag_parser),
+                                                self.fonts, self.ignore_drawings, self.warn_on_exact)
+            missing = {}
+            for font_key, chars in line_chars.items():
+                if font_missing := font_key[1].missing_glyphs(chars):
+                    missing[font_key] = font_missing
+            result = out.getvalue(), set(issues), line_chars, missing
+        self.results[key] = result
+        return unknown, result
+
+    def _add(self, nline, row):
+        unknown, (output, issues, line_chars, missing) = row
+        for category, key in issues:
+            self.lines[category][key].add(nline)
+        for key, chars in line_chars.items():
+            self.chars[key].update(chars)
+        for key, chars in missing.items():
+            self.missing[key].update(chars)
+            self.lines["missing_glyphs_lines"][key].add(nline)
+        if unknown is not None or output:
+            self.noisy += 1
+
+    def _remove(self, nline, row):
+        unknown, (output, issues, line_chars, missing) = row
+
+        def discard(counts, key, chars):
+            counts[key].subtract(chars)
+            for char in chars:
+                if counts[key][char] == 0:
+                    del counts[key][char]
+            if not counts[key]:
+                del counts[key]
+
+        for category, key in itertools.chain(issues, (("missing_glyphs_lines", key) for key in missing)):
+            lines = self.lines[category][key]
+            lines.discard(nline)
+            if not lines:
+                del self.lines[category][key]
+        for key, chars in line_chars.items():
+            discard(self.chars, key, chars)
+        for key, chars in missing.items():
+            discard(self.missing, key, chars)
+        if unknown is not None or output:
+            self.noisy -= 1
+
+    def _shift(self, after, shift):
+        """Shift the line numbers after the given one by shift."""
+        for issues in self.lines.values():
+            for key, lines in issues.items():
+                issues[key] = {nline + shift if nline > after else nline for nline in lines}
+
+    def check(self, doc):
+        """Check a document like check_fonts."""
+        styles = document_styles(doc)
+        if styles != self.styles:
+            self._reset(styles)
+
+        # the range of events that changed
+        events = doc.events[:]
+        end = min(len(self.events), len(events))
+        start = 0
+        while start < end and self.events[start] is events[start]:
+            start += 1
+        stop = 0
+        while stop < end - start and self.events[-1 - stop] is events[-1 - stop]:
+            stop += 1
+
+        if len(events) == len(self.events):
+            # lines were only changed in place
+            changed = [i for i in range(start, len(events) - stop) if events[i] is not self.events[i]]
+            added = [self._row(events[i]) for i in changed]
+            for i, row in zip(changed, added):
+                if self.rows[i] is not None:
+                    self._remove(i + 1, self.rows[i])
+                self.rows[i] = row
+        else:
+            changed = range(start, len(events) - stop)
+            added = [self._row(events[i]) for i in changed]
+            for nline, row in enumerate(self.rows[start:len(self.rows) - stop], start + 1):
+                if row is not None:
+                    self._remove(nline, row)
+            self._shift(start, len(events) - len(self.events))
+            self.rows[start:len(self.rows) - stop] = added
+        for i, row in zip(changed, added):
+            if row is not None:
+                self._add(i + 1, row)
+        self.events = events
+
+        for key in list(itertools.islice(self.results, max(0, len(self.results) - 2 * len(events)))):
+            del self.results[key]
+
+        if self.noisy:
+            for nline, row in enumerate(self.rows, 1):
+                if row is not None:
+                    unknown, (output, *_) = row
+                    if unknown is not None:
+                        get_line_style(nline, unknown, styles)
+                    print(output, end='')
+
+        report = new_report()
+        for category, issues in self.lines.items():
+            report[category].update(issues)
+        for key, chars in self.chars.items():
+            report["used_chars"][key[1]].update(chars)
+        for key, chars in self.missing.items():
+            report["missing_glyphs"][key].update(chars)
+        return report
+
+def _merge_fonts(issues):
+    """Merge the issues of a report category that differ only in the resolved font."""
+    merged = collections.defaultdict(set)
+    for key, values in issues.items():
+        merged[key[:-1]].update(values)
+    return sorted(merged.items(), key=lambda x: x[0])
+
+def print_report(report):
+    """Print a report from check_fonts, returning the number of issues."""
     issues = 0
 
     def format_lines(lines, limit=10):
@@ -280,34 +1015,112 @@ def validate_fonts(doc, fonts, ignore_drawings=False, warn_on_exact=False):
         issues += 1
         print(f"- Could not find font {font} on line(s): {format_lines(lines)}")
 
-    for (font, reqweight, realweight), lines in sorted(report["faux_bold"].items(), key=lambda x: x[0]):
+    for (font, reqweight, realweight), lines in _merge_fonts(report["faux_bold"]):
         issues += 1
         print(f"- Faux bold used for font {font} (requested weight {reqweight}, got {realweight}) " \
               f"on line(s): {format_lines(lines)}")
 
-    for font, lines in sorted(report["faux_italic"].items(), key=lambda x: x[0]):
+    for (font,), lines in _merge_fonts(report["faux_italic"]):
         issues += 1
         print(f"- Faux italic used for font {font} on line(s): {format_lines(lines)}")
 
-    for (font, reqweight, realweight), lines in sorted(report["mismatch_bold"].items(), key=lambda x: x[0]):
+    for (font, reqweight, realweight), lines in _merge_fonts(report["mismatch_bold"]):
         issues += 1
         print(f"- Requested weight {reqweight} but got {realweight} for font {font} " \
               f"on line(s): {format_lines(lines)}")
 
-    for font, lines in sorted(report["mismatch_italic"].items(), key=lambda x: x[0]):
+    for (font,), lines in _merge_fonts(report["mismatch_italic"]):
         issues += 1
         print(f"- Requested non-italic but got italic for font {font} on line(s): " + \
               format_lines(lines))
 
-    for font, lines in sorted(report["missing_glyphs_lines"].items(), key=lambda x: x[0]):
+    missing_glyphs = dict(_merge_fonts(report["missing_glyphs"]))
+    for (font,), lines in _merge_fonts(report["missing_glyphs_lines"]):
         issues += 1
-        missing = ' '.join(f'{g}(U+{ord(g):04X})' for g in sorted(report['missing_glyphs'][font]))
+        missing = ' '.join(f'{g}(U+{ord(g):04X})' for g in sorted(missing_glyphs[font,]))
         print(f"- Font {font} is missing glyphs {missing} " \
               f"on line(s): {format_lines(lines)}")
 
     print(f"{issues} issue(s) found")
-    return issues > 0
+    return issues
+
+def report_issues(report):
+    """Convert a report from check_fonts into a list of JSON-serializable issues,
+    in the same order as they are printed."""
+    def resolved(font):
+        return {"file": font.name, "index": font.font_number}
+
+    def by_font(items):
+        return sorted(items, key=lambda x: (x[0][:-1], x[0][-1].name, x[0][-1].font_number))
 
+    issues = []
+    for font, lines in sorted(report["missing_font"].items(), key=lambda x: x[0]):
+        issues.append({"type": "missing_font", "font": font, "lines": sorted(lines)})
+
+    for category in ("faux_bold", "faux_italic", "mismatch_bold", "mismatch_italic"):
+        for key, lines in by_font(report[category].items()):
+            issue = {"type": category, "font": key[0]}
+            if len(key) == 4:
+                issue["requested_weight"], issue["weight"] = key[1:3]
+            issues.append({**issue, **resolved(key[-1]), "lines": sorted(lines)})
+
+    for key, lines in by_font(report["missing_glyphs_lines"].items()):
+        glyphs = sorted(report["missing_glyphs"][key])
+        issues.append({"type": "missing_glyphs", "font": key[0], **resolved(key[1]),
+                       "glyphs": glyphs, "codepoints": [ord(g) for g in glyphs],
+                       "lines": sorted(lines)})
+
+    return issues
+
+def validate_fonts(doc, fonts, ignore_drawings=False, warn_on_exact=False, jobs=1):
+    return print_report(check_fonts(doc, fonts, ignore_drawings, warn_on_exact, jobs=jobs)) > 0
+
+class ReportWriter:
+    """Write validation results as they become available, either as a single
+    JSON array or as newline-delimited JSON with one object per line."""
+
+    def __init__(self, format, stream):
+        self.format = format
+        self.stream = stream
+        self.count = 0
+
+    def write(self, record):
+        if self.format == "json":
+            self.stream.write(",\n" if self.count else "[\n")
+        self.stream.write(json.dumps(record, ensure_ascii=False))
+        if self.format == "ndjson":
+            self.stream.write("\n")
+        self.stream.flush()
+        self.count += 1
+
+    def close(self):
+        if self.format == "json":
+            self.stream.write("\n]\n" if self.count else "[]\n")
+            self.stream.flush()
+
+def validate_track(filename, name, doc, fonts, args, emit=None, jobs=1, tag_stats=None):
+    """Validate a single subtitle track and output the report with output_report."""
+    print(f"Validating track {name}")
+    return output_report(filename, name, check_fonts(doc, fonts, args.ignore_drawings,
+                                                     args.warn_fullname_mismatch, jobs=jobs,
+                                                     tag_stats=tag_stats), emit)
+
+def output_report(filename, name, report, emit=None):
+    """Print the report for a subtitle track, or pass it to emit as a
+    JSON-serializable record if given. Returns whether any issues were found."""
+    if emit is None:
+        return print_report(report) > 0
+
+    issues = report_issues(report)
+    emit({"file": filename, "track": name, "issues": issues})
+    return len(issues) > 0
+
+def structured_output(args):
+    """Return a ReportWriter for the selected output format (or None for
+    text output) and a context in which other output goes to stderr."""
+    if args.format == "text":
+        return None, contextlib.nullcontext()
+    return ReportWriter(args.format, sys.stdout), contextlib.redirect_stdout(sys.stderr)
 
 
 def get_element(parent, element, id=False):
@@ -322,13 +1135,69 @@ def get_elements(parent, *element, id=False):
 def get_dicts(parent, element, id=False):
     return ({x.name: x for x in elem} for elem in get_elements(parent, element, id=id))
 
-
-def get_subtitles(mkv):
+def element_at(segment, position):
+    segment.stream.seek(segment.payloadOffset + position)
+    element, _ = segment.parseElement(segment.stream)
+    return element
+
+def seek_elements(segment, element):
+    """Find the top-level elements of a segment with the given name.
+
+    Jumps straight to the elements indexed by the segment's SeekHead,
+    falling back to scanning every top-level element (including all clusters)
+    if there is no SeekHead or it doesn't index the element."""
+    element_id = segment.schema[element].id
+    seekhead_id = segment.schema["SeekHead"].id
+
+    seekheads = []
+    for elem in segment:
+        if elem.name == "SeekHead":
+            seekheads.append(elem)
+            break
+        elif elem.name == "Cluster":
+            break
+
+    found = []
+    seen = set()
+    while seekheads:
+        for seek in get_dicts(seekheads.pop(), "Seek"):
+            seek_id = int.from_bytes(seek["SeekID"].value, 'big')
+            position = seek["SeekPosition"].value
+            if seek_id not in (element_id, seekhead_id) or position in seen:
+                continue
+            seen.add(position)
+
+            # the SeekHead may point to further SeekHeads
+            elem = element_at(segment, position)
+            if elem.id == element_id:
+                found.append(elem)
+            elif elem.id == seekhead_id:
+                seekheads.append(elem)
+
+    if found:
+        return found
+    return list(get_elements(segment, element))
+
+def read_block(block, tracks):
+    """Read the payload of a Block or SimpleBlock element, skipping the
+    payload without reading it unless the block belongs to one of the given tracks."""
+    stream = block.stream
+    stream.seek(block.payloadOffset)
+    track, length = ebmlite.decoding.readElementSize(stream)
+    if track not in tracks:
+        return track, None
+
+    # skip the timestamp and flags
+    stream.seek(3, io.SEEK_CUR)
+    return track, stream.read(block.size - length - 3)
+
+
+def get_subtitles(mkv, streaming=False):
     subtitles = []
 
     for segment in get_elements(mkv, "Segment"):
         tracks_to_read = {}
-        tracks = get_element(segment, "Tracks")
+        tracks = seek_elements(segment, "Tracks")[0] if streaming else get_element(segment, "Tracks")
         for track in get_dicts(tracks, "TrackEntry"):
             if track["CodecID"].value != b'S_TEXT/ASS':
                 continue
@@ -348,41 +1217,113 @@ def get_subtitles(mkv):
             tracks_to_read[track["TrackNumber"].value] = track_name, assdoc, compression
 
         track_lines = {k: {} for k in tracks_to_read}
-        for cluster in get_elements(segment, "Cluster"):
+
+        def add_line(track, data):
+            _, _, compression = tracks_to_read[track]
+            if compression:
+                data = zlib.decompress(data)
+
+            order, line = data.split(b',', 1)
+            # strip like ass.parse does with whole lines
+            track_lines[track][int(order)] = ass.Dialogue.parse(
+                "Dialogue", line.decode('utf-8').strip(), BLOCK_FIELD_ORDER)
+
+        for cluster in get_elements(segment, "Cluster") if tracks_to_read else []:
             for elem in cluster:
                 if elem.name == "SimpleBlock":
-                    block = elem.value
+                    block = elem
                 elif elem.name == "BlockGroup":
-                    block = get_element(elem, 0xa1, id=True).value
+                    block = get_element(elem, 0xa1, id=True)
                 else:
                     continue
 
-                stream = io.BytesIO(block)
+                if streaming:
+                    track, data = read_block(block, tracks_to_read)
+                    if data is not None:
+                        add_line(track, data)
+                    continue
+
+                stream = io.BytesIO(block.value)
                 track, _ = ebmlite.decoding.readElementSize(stream)
                 if track in tracks_to_read:
-                    _, _, compression = tracks_to_read[track]
-
-                    timestamp = ebmlite.decoding.readInt(stream, 2)
-                    stream.read(1)
-
-                    data = stream.read()
-                    if compression:
-                        data = zlib.decompress(data)
-
-                    order, layer, line = data.split(b',', 2)
-                    timestamp = b'0:00:00.00,0:00:00.00'
-                    track_lines[track][int(order)] = b'Dialogue: ' + layer + b',' + timestamp + b',' + line
+                    # skip the timestamp and flags
+                    stream.seek(3, io.SEEK_CUR)
+                    add_line(track, stream.read())
 
         for track_id, l in track_lines.items():
             name, assdoc, _ = tracks_to_read[track_id]
-            lines = b'[Events]\n' + b'\n'.join([l[k] for k in sorted(l)])
-            events = ass.parse(io.TextIOWrapper(io.BytesIO(lines), encoding='utf_8_sig'))
-            assdoc.events.extend(events.events)
+            assdoc.events.extend(l[k] for k in sorted(l))
             subtitles.append((name, assdoc))
 
     return subtitles
 
 
+class AttachmentFile(io.RawIOBase):
+    """Read-only file object over a byte range of a memory-mapped file.
+
+    Used to read fonts attached to an MKV without copying them into memory."""
+
+    def __init__(self, mapping, offset, size, filename=None):
+        self.mapping = mapping
+        self.offset = offset
+        self.size = size
+        self.filename = filename
+        self.pos = 0
+
+    @classmethod
+    def open(cls, filename, offset, size):
+        with open(filename, 'rb') as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapping, offset, size, filename)
+
+    def __reduce__(self):
+        # map the file again when sent to a worker process
+        return type(self).open, (self.filename, self.offset, self.size)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, pos, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            pos += self.pos
+        elif whence == io.SEEK_END:
+            pos += self.size
+        if pos < 0:
+            raise ValueError(f"negative seek position {pos}")
+        self.pos = pos
+        return pos
+
+    def tell(self):
+        return self.pos
+
+    def read(self, size=-1):
+        end = self.size if size is None or size < 0 else min(self.pos + size, self.size)
+        if end <= self.pos:
+            return b''
+        data = self.mapping[self.offset + self.pos:self.offset + end]
+        self.pos = end
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def getbuffer(self):
+        return memoryview(self.mapping)[self.offset:self.offset + self.size]
+
+
+def map_file(stream):
+    """Memory-map the file underlying a stream, or return None if it can't be mapped."""
+    try:
+        return mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError, OverflowError):
+        return None
+
+
 # from mpv
 FONT_MIMETYPES = {
     b"application/x-truetype-font",
@@ -396,18 +1337,24 @@ FONT_MIMETYPES = {
     b"font/ttf"
 }
 
-def get_fonts(mkv):
+def get_fonts(mkv, streaming=False):
     fonts = []
+    mapping = map_file(mkv.stream)
 
     for segment in get_elements(mkv, "Segment"):
-        for attachments in get_elements(segment, "Attachments"):
+        for attachments in (seek_elements(segment, "Attachments") if streaming
+                            else get_elements(segment, "Attachments")):
             for attachment in get_dicts(attachments, "AttachedFile"):
                 if attachment["FileMimeType"].value not in FONT_MIMETYPES:
                     print(f"Ignoring non-font attachment {attachment['FileName'].value}")
                     continue
 
-                fonts.append((attachment["FileName"].value,
-                              io.BytesIO(attachment["FileData"].value)))
+                data = attachment["FileData"]
+                if mapping is not None:
+                    fontfile = AttachmentFile(mapping, data.payloadOffset, data.size, mkv.filename)
+                else:
+                    fontfile = io.BytesIO(data.value)
+                fonts.append((attachment["FileName"].value, fontfile))
 
     return fonts
 
@@ -415,6 +1362,144 @@ def is_mkv(filename):
     with open(filename, 'rb') as f:
         return f.read(4) == b'\x1a\x45\xdf\xa3'
 
+def read_subtitles(filename, schema, streaming=False, parse=ass.parse):
+    """Read the subtitle tracks and any attached fonts from an MKV or ASS file,
+    parsing ASS files with the given function."""
+    if is_mkv(filename):
+        mkv = schema.load(filename)
+        return get_subtitles(mkv, streaming), get_fonts(mkv, streaming)
+    else:
+        with open(filename, 'r', encoding='utf_8_sig') as f:
+            return [(os.path.basename(filename), parse(f))], []
+
+def read_font_sources(sources, schema, streaming=False):
+    fontlist = []
+    for additional_fonts in sources:
+        path = pathlib.Path(additional_fonts)
+        if path.is_dir():
+            fontlist.extend((p.name, str(p)) for p in path.iterdir() if p.is_file())
+        elif is_mkv(additional_fonts):
+            fontmkv = schema.load(additional_fonts)
+            fontlist.extend(get_fonts(fontmkv, streaming))
+        else:
+            fontlist.append((path.name, additional_fonts))
+    return fontlist
+
+def load_resolutions(path, fonts):
+    """Make fonts reuse the matches saved by save_resolutions, if they were made for the same fonts."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get("version") != RESOLUTIONS_VERSION:
+            print(f"Warning: Ignoring font resolutions {path} from a different version")
+        elif data["fonts"] != fonts.fingerprint():
+            print(f"Warning: Ignoring font resolutions {path} made for different fonts")
+        else:
+            fonts.import_resolutions(data["resolutions"])
+    except FileNotFoundError:
+        pass
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        print(f"Warning: Ignoring invalid font resolutions {path}: {e}")
+
+def save_resolutions(path, fonts, table=None):
+    """Save the matches made by fonts (or the given resolutions() table) to a file."""
+    data = {"version": RESOLUTIONS_VERSION, "fonts": fonts.fingerprint(),
+            "resolutions": fonts.resolutions() if table is None else table}
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=1, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def peak_rss():
+    """Return the peak resident set size of the process so far in bytes,
+    or None if it is not available on this platform."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # reported in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+class Timings:
+    """Records the wall time, CPU time and peak memory use of the stages of a run.
+    The peak memory is that of the whole process up to the end of each stage."""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.stages = []
+        # hits and misses of the override tag cache, filled by check_fonts
+        self.tag_stats = collections.Counter()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.stages.append((name, time.perf_counter() - wall, time.process_time() - cpu,
+                                peak_rss()))
+
+    def print(self, fonts=None, slowest=5, file=sys.stderr):
+        print("Timings (wall, CPU, peak memory):", file=file)
+        for name, wall, cpu, peak in self.stages:
+            memory = "" if peak is None else f", {peak / 2**20:.1f} MiB"
+            print(f"- {name}: {wall:.3f}s, {cpu:.3f}s{memory}", file=file)
+        total = sum(wall for _, wall, _, _ in self.stages)
+        print(f"Total: {total:.3f}s", file=file)
+
+        if fonts is None:
+            return
+        files = len({font.fontfile if isinstance(font.fontfile, str) else id(font.fontfile)
+                     for font in fonts.fonts})
+        print(f"Fonts: {len(fonts.fonts)} face(s) in {files} file(s), "
+              f"{fonts.files_parsed} file(s) parsed", file=file)
+        lookups = fonts.hits + fonts.misses
+        if lookups:
+            print(f"Font match cache: {fonts.hits} hit(s), {fonts.misses} miss(es) "
+                  f"({fonts.hits / lookups:.1%} hit rate)", file=file)
+        hits, misses = self.tag_stats["hits"], self.tag_stats["misses"]
+        if hits + misses:
+            print(f"Override tag cache: {hits} hit(s), {misses} miss(es) "
+                  f"({hits / (hits + misses):.1%} hit rate)", file=file)
+        if fonts.parse_times:
+            print("Slowest fonts to read:", file=file)
+            for name, seconds in sorted(fonts.parse_times.items(),
+                                        key=lambda x: x[1], reverse=True)[:slowest]:
+                print(f"- {name}: {seconds:.3f}s", file=file)
+
+def add_common_arguments(parser):
+    parser.add_argument('--ignore-drawings', action='store_true', default=False,
+                        help="Don't warn about missing fonts only used for drawings.")
+    parser.add_argument('--warn-fullname-mismatch', action='store_true', default=False,
+                        help="Warn about mismatched styles even when using the full font name.")
+    parser.add_argument('--eager-fonts', action='store_true', default=False,
+                        help="Read the glyph tables of all fonts up front, "
+                             "reporting unreadable fonts even if they are not used.")
+    parser.add_argument('--stream-mkv', action='store_true', default=False,
+                        help="Locate tracks and attachments in Matroska files using the SeekHead "
+                             "and only read the subtitle blocks.")
+    parser.add_argument('-j', '--jobs', type=int, default=1, metavar='N',
+                        help="Parse fonts and large subtitle tracks using N processes (default: 1).")
+    parser.add_argument('--font-index', metavar='FILE', help="""
+Cache font metadata in the given file, so that only new or changed fonts
+need to be parsed on subsequent runs.
+""")
+    parser.add_argument('--load-resolutions', metavar='FILE', help="""
+Reuse the font matches saved with --save-resolutions, as long as they were made for the same fonts.
+""")
+    parser.add_argument('--save-resolutions', metavar='FILE', help="""
+Save which font each requested font, weight and italic combination was matched to,
+why, and how closely, to the given JSON file.
+""")
+    parser.add_argument('--format', choices=('text', 'json', 'ndjson'), default='text', help="""
+Output format of the report. json writes an array with one object per
+subtitle track and ndjson one such object per line; other messages are
+written to stderr.
+""")
+
 def main():
     parser = argparse.ArgumentParser(
         description="Validate font usage in a muxed Matroska file or an ASS file.")
@@ -426,40 +1511,539 @@ If a Matroska file is provided, any attached fonts will be used.
 List of additional fonts to use for verification.
 May be a Matroska file with fonts attached, a directory containing font files, or a single font file.
 """)
-    parser.add_argument('--ignore-drawings', action='store_true', default=False,
-                        help="Don't warn about missing fonts only used for drawings.")
-    parser.add_argument('--warn-fullname-mismatch', action='store_true', default=False,
-                        help="Warn about mismatched styles even when using the full font name.")
+    parser.add_argument('--watch', action='store_true', default=False, help="""
+Keep running and validate the subtitles again whenever they or the fonts change,
+only checking lines that changed. Stop with Ctrl+C.
+""")
+    parser.add_argument('--timings', action='store_true', default=False, help="""
+Print the wall time and CPU time of each stage of the run along with the peak
+memory use of the process so far (excluding worker processes, and not available
+on Windows), font cache statistics and the slowest fonts to read to stderr.
+""")
+    parser.add_argument('--profile', metavar='FILE', help="""
+Profile the run with cProfile and write the statistics to the given file.
+""")
+    add_common_arguments(parser)
     args = parser.parse_args()
 
-    schema = ebmlite.loadSchema("matroska.xml")
+    if args.profile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        return run(args)
+    finally:
+        if args.profile:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+
+def run(args):
+    timings = Timings(args.timings and not args.watch)
+    with timings.stage("load schema"):
+        schema = ebmlite.loadSchema("matroska.xml")
+    writer, output = structured_output(args)
+
+    if args.watch:
+        with output:
+            issues = watch(args, schema, writer and writer.write)
+        if writer is not None:
+            writer.close()
+        return issues
+
+    fonts = None
+    with output:
+        with timings.stage("read subtitles"):
+            subtitles, fontlist = read_subtitles(args.subtitles, schema, args.stream_mkv)
+        with timings.stage("read font sources"):
+            fontlist.extend(read_font_sources(args.additional_fonts, schema, args.stream_mkv))
+
+        issues = False
+        with timings.stage("read fonts"):
+            fonts = FontCollection(fontlist, FontIndex(args.font_index) if args.font_index else None,
+                                   jobs=args.jobs, lazy=not args.eager_fonts)
+        if args.load_resolutions:
+            load_resolutions(args.load_resolutions, fonts)
+        for name, doc in subtitles:
+            with timings.stage(f"validate {name}"):
+                issues = validate_track(args.subtitles, name, doc, fonts, args,
+                                        writer and writer.write, args.jobs,
+                                        timings.tag_stats) or issues
+        if args.save_resolutions:
+            save_resolutions(args.save_resolutions, fonts)
+
+    if writer is not None:
+        writer.close()
+    if args.timings:
+        timings.print(fonts)
+    return issues
 
-    if is_mkv(args.subtitles):
-        mkv = schema.load(args.subtitles)
-        subtitles = get_subtitles(mkv)
-        fontlist = get_fonts(mkv)
-    else:
-        with open(args.subtitles, 'r', encoding='utf_8_sig') as f:
-            subtitles = [(os.path.basename(args.subtitles), ass.parse(f))]
-        fontlist = []
+def _common_length(a, a_start, b, b_start, length, backwards=False):
+    """Return the length (up to length) of the common prefix of a[a_start:]
+    and b[b_start:], or with backwards, of the common suffix of a[:a_start]
+    and b[:b_start]. The strings are compared in blocks of decreasing size so
+    that most of the comparing is done in C."""
+    i = 0
+    for block in (65536, 1024, 32, 1):
+        while i + block <= length:
+            if backwards:
+                same = a[a_start - i - block:a_start - i] == b[b_start - i - block:b_start - i]
+            else:
+                same = a[a_start + i:a_start + i + block] == b[b_start + i:b_start + i + block]
+            if not same:
+                break
+            i += block
+    return i
+
+class CachingParser:
+    """Parses successive versions of an ASS file. Only the lines of the events
+    section that changed since the previous version are parsed again, reusing
+    the event objects of the other lines and of lines seen in recent versions."""
+
+    def __init__(self):
+        # event objects by (type name, raw line, field order), least recently used first
+        self.events = {}
+        # the text of the previous version and the offsets of its events section,
+        # the event of each of its lines (or None), the positions of Format
+        # lines and the final field order
+        self.text = ""
+        self.body = None
+        self.parsed = []
+        self.formats = []
+        self.field_order = None
+
+    def _parse_lines(self, section, lines, offset):
+        """Parse raw lines of an events section, as ass.Document.parse_file does,
+        returning the event of each (or None) and the positions of Format lines."""
+        parsed = []
+        formats = []
+        for i, line in enumerate(lines, offset):
+            line = line.strip()
+            if not line or line.startswith(';') or ':' not in line:
+                parsed.append(None)
+                continue
 
-    for additional_fonts in args.additional_fonts:
-        path = pathlib.Path(additional_fonts)
-        if path.is_dir():
-            fontlist.extend((p.name, str(p)) for p in path.iterdir() if p.is_file())
-        elif is_mkv(additional_fonts):
-            fontmkv = schema.load(additional_fonts)
-            fontlist.extend(get_fonts(fontmkv))
-        else:
-            fontlist.append((path.name, additional_fonts))
+            type_name, _, line = line.partition(":")
+            line = line.lstrip()
+            if type_name.lower() == section.FORMAT_TYPE.lower():
+                section.add_line(type_name, line)
+                parsed.append(None)
+                formats.append(i)
+                continue
 
+            key = type_name, line, tuple(section.field_order)
+            if (event := self.events.pop(key, None)) is None:
+                section.add_line(type_name, line)
+                event = section._lines.pop()
+            self.events[key] = event
+            parsed.append(event)
+        return parsed, formats
+
+    def _changed_lines(self, text, start, end):
+        """Return the number of lines at the start and at the end of the events
+        section text[start:end] that are the same as in the previous version,
+        and the offsets of the lines in between."""
+        if self.body is None:
+            return 0, 0, start, end
+
+        old_start, old_end = self.body
+        length = min(end - start, old_end - old_start)
+        prefix = _common_length(text, start, self.text, old_start, length)
+        suffix = _common_length(text, end, self.text, old_end, length - prefix, backwards=True)
+
+        # only count lines that are entirely the same
+        same_start = text.count("\n", start, start + prefix)
+        same_end = text.count("\n", end - suffix, end)
+        if same_start > 0:
+            start = text.rindex("\n", start, start + prefix) + 1
+        if same_end > 0:
+            end = text.index("\n", end - suffix, end)
+        return same_start, same_end, start, end
+
+    def __call__(self, f):
+        text = f.read()
+        # a header on the first line can't end the events section
+        headers = list(SECTION_PATTERN.finditer(text))
+        events = [i for i, m in enumerate(headers)
+                  if m.group(1).lower() == ass.Document.EVENTS_HEADER.lower()]
+        if len(events) != 1:
+            self.body = None
+            return ass.Document.parse_file(io.StringIO(text))
+
+        i = events[0]
+        header_end = headers[i].end()
+        body_end = headers[i + 1].start() if i + 1 < len(headers) else len(text)
+        body_start = min(header_end + 1, body_end)
+        doc = ass.Document.parse_file(io.StringIO(text[:header_end] + text[body_end:]))
+        section = doc.events
+
+        same_start, same_end, start, end = self._changed_lines(text, body_start, body_end)
+        if self.formats and self.formats[-1] >= same_start:
+            # the field order may have changed before the changed lines
+            same_start = same_end = 0
+            start, end = body_start, body_end
+        if same_start > 0:
+            section.field_order = self.field_order
+
+        parsed, formats = self._parse_lines(section, text[start:end].split("\n"), same_start)
+        if formats and same_end > 0:
+            # the lines after a changed Format line need to be parsed again
+            section.field_order = self.field_order if same_start > 0 else type(section).field_order
+            same_end = 0
+            parsed, formats = self._parse_lines(section, text[start:body_end].split("\n"), same_start)
+
+        parsed = self.parsed[:same_start] + parsed + self.parsed[len(self.parsed) - same_end:]
+        section.set_data(list(filter(None, parsed)))
+
+        for key in list(itertools.islice(self.events, max(0, len(self.events) - 2 * len(parsed)))):
+            del self.events[key]
+        self.text = text
+        self.body = body_start, body_end
+        self.parsed = parsed
+        self.formats = [i for i in self.formats if i < same_start] + formats
+        self.field_order = section.field_order
+        return doc
+
+def file_stamps(paths):
+    """Return the size and modification time of the given files
+    and of the files in the given directories."""
+    stamps = []
+    for path in paths:
+        try:
+            if os.path.isdir(path):
+                with os.scandir(path) as entries:
+                    stamps.extend((entry.path, entry.stat().st_size, entry.stat().st_mtime_ns)
+                                  for entry in entries if entry.is_file())
+            else:
+                stat = os.stat(path)
+                stamps.append((path, stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            stamps.append((path, None, None))
+    return sorted(stamps)
+
+def watch(args, schema, emit=None, interval=WATCH_INTERVAL):
+    """Validate the subtitles every time they or the fonts change, until interrupted.
+
+    Files are only read once their size and modification time stay the same for
+    one interval. Fonts are only read again when they change (or, for a Matroska
+    file, when the file changes), and only lines that changed are checked again.
+    Returns whether any issues were found in the last validation."""
+    # keep the metadata of unchanged fonts even if no index file is given
+    index = FontIndex(args.font_index)
+    parse = CachingParser()
+    subtitles_stamp = fonts_stamp = None
+    polled = None
+    checkers = {}
     issues = False
-    fonts = FontCollection(fontlist)
-    for name, doc in subtitles:
-        print(f"Validating track {name}")
-        issues = issues or validate_fonts(doc, fonts, args.ignore_drawings, args.warn_fullname_mismatch)
+
+    try:
+        while True:
+            new_subtitles_stamp = file_stamps([args.subtitles])
+            new_fonts_stamp = file_stamps(args.additional_fonts)
+            # wait for the files to stay the same between two polls, so that
+            # files that are still being written are not read
+            unchanged = polled == (new_subtitles_stamp, new_fonts_stamp)
+            polled = new_subtitles_stamp, new_fonts_stamp
+            if not unchanged or (new_subtitles_stamp == subtitles_stamp and new_fonts_stamp == fonts_stamp):
+                time.sleep(interval)
+                continue
+
+            start = time.perf_counter()
+            subtitles_stamp = new_subtitles_stamp
+            try:
+                subtitles, fontlist = read_subtitles(args.subtitles, schema, args.stream_mkv, parse)
+                if fontlist or new_fonts_stamp != fonts_stamp:
+                    fontlist.extend(read_font_sources(args.additional_fonts, schema, args.stream_mkv))
+                    fonts = FontCollection(fontlist, index, jobs=args.jobs, lazy=not args.eager_fonts)
+                    if args.load_resolutions:
+                        load_resolutions(args.load_resolutions, fonts)
+                    fonts_stamp = new_fonts_stamp
+                    checkers = {}
+
+                issues = False
+                for name, doc in subtitles:
+                    print(f"Validating track {name}")
+                    if (checker := checkers.get(name)) is None:
+                        checker = checkers[name] = IncrementalChecker(
+                            fonts, args.ignore_drawings, args.warn_fullname_mismatch)
+                    issues = output_report(args.subtitles, name, checker.check(doc), emit) or issues
+                if args.save_resolutions:
+                    save_resolutions(args.save_resolutions, fonts)
+            except Exception as e:
+                print(f"Error validating {args.subtitles}: {e}")
+
+            print(f"Validated in {time.perf_counter() - start:.3f}s; watching for changes")
+            sys.stdout.flush()
+    except KeyboardInterrupt:
+        pass
 
     return issues
 
+
+def validate_file(filename, shared_fonts, args, emit=None, jobs=1):
+    """Validate all tracks of a single file for batch mode, using the fonts
+    attached to it on top of the shared fonts.
+
+    Returns the number of tracks validated and the number with issues."""
+    schema = ebmlite.loadSchema("matroska.xml")
+    subtitles, fontlist = read_subtitles(filename, schema, args.stream_mkv)
+
+    fonts = shared_fonts
+    if fontlist:
+        fonts = OverlayFontCollection(fontlist, shared_fonts, lazy=not args.eager_fonts)
+
+    tracks_with_issues = 0
+    for name, doc in subtitles:
+        if validate_track(filename, name, doc, fonts, args, emit, jobs):
+            tracks_with_issues += 1
+
+    return len(subtitles), tracks_with_issues
+
+def validate_file_captured(filename, shared_fonts, args, jobs=1):
+    """Run validate_file, capturing its output (and its records, for structured
+    output formats) so that the output of files validated concurrently
+    doesn't get interleaved."""
+    out = io.StringIO()
+    records = []
+    emit = records.append if args.format != "text" else None
+    with contextlib.redirect_stdout(out):
+        try:
+            result = validate_file(filename, shared_fonts, args, emit, jobs), None
+        except Exception as e:
+            result = None, str(e)
+    return out.getvalue(), *result, records
+
+_worker_fonts = None
+
+def _init_worker(fonts):
+    global _worker_fonts
+    _worker_fonts = fonts
+
+def _validate_in_worker(filename, args):
+    return *validate_file_captured(filename, _worker_fonts, args), _worker_fonts.resolutions()
+
+def expand_inputs(patterns):
+    files = []
+    for pattern in patterns:
+        if not os.path.exists(pattern) and glob.has_magic(pattern):
+            if not (matches := sorted(glob.glob(pattern))):
+                print(f"Warning: No files match {pattern}")
+            files.extend(matches)
+        else:
+            files.append(pattern)
+    return files
+
+def batch_main():
+    parser = argparse.ArgumentParser(
+        description="Validate font usage in a batch of muxed Matroska files or ASS files.")
+    parser.add_argument('inputs', nargs='+', help="""
+Files containing the subtitles to verify, or glob patterns matching them.
+Fonts attached to each Matroska file are used for that file only.
+""")
+    parser.add_argument('-f', '--fonts', action='append', default=[], metavar='PATH', help="""
+Additional fonts shared by all inputs. May be a Matroska file with fonts attached,
+a directory containing font files, or a single font file. May be given multiple times.
+""")
+    add_common_arguments(parser)
+    args = parser.parse_intermixed_args()
+
+    schema = ebmlite.loadSchema("matroska.xml")
+    writer, output = structured_output(args)
+
+    with output:
+        inputs = expand_inputs(args.inputs)
+
+        shared_fonts = FontCollection(read_font_sources(args.fonts, schema, args.stream_mkv),
+                                      FontIndex(args.font_index) if args.font_index else None,
+                                      jobs=args.jobs, lazy=not args.eager_fonts)
+        if args.load_resolutions:
+            load_resolutions(args.load_resolutions, shared_fonts)
+
+        if args.jobs > 1 and len(inputs) > 1:
+            executor = concurrent.futures.ProcessPoolExecutor(
+                args.jobs, initializer=_init_worker, initargs=(shared_fonts,))
+            results = executor.map(_validate_in_worker, inputs, itertools.repeat(args))
+        else:
+            executor = None
+            results = ((*validate_file_captured(filename, shared_fonts, args, args.jobs), None)
+                       for filename in inputs)
+
+        summary = []
+        resolutions = {}
+        try:
+            for filename, (text, result, error, records, table) in zip(inputs, results):
+                print(f"Validating file {filename}")
+                print(text, end='')
+                if error is not None:
+                    print(f"Error validating {filename}: {error}")
+                    if writer is not None:
+                        writer.write({"file": filename, "error": error})
+                if writer is not None:
+                    for record in records:
+                        writer.write(record)
+                summary.append((filename, result, error))
+                # matches made by the worker processes against the shared fonts
+                for entry in table or []:
+                    resolutions[entry["font"], entry["weight"], entry["italic"]] = entry
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        failed = False
+        print("Summary:")
+        for filename, result, error in summary:
+            if error is not None:
+                failed = True
+                print(f"- {filename}: error: {error}")
+            elif result[1] > 0:
+                failed = True
+                print(f"- {filename}: issues found in {result[1]} of {result[0]} track(s)")
+            else:
+                print(f"- {filename}: OK")
+
+        if args.save_resolutions:
+            if executor is None:
+                save_resolutions(args.save_resolutions, shared_fonts)
+            else:
+                save_resolutions(args.save_resolutions, shared_fonts,
+                                 [resolutions[key] for key in sorted(resolutions)])
+
+    if writer is not None:
+        writer.close()
+    return failed
+
+def subset_font(fontfile, font_number, codepoints, path):
+    """Write a copy of a font face containing only the glyphs needed for the
+    given codepoints. Returns an error message if the font couldn't be subset."""
+    options = subset.Options()
+    options.font_number = font_number
+    # keep all names so that the subset font is matched the same way
+    options.name_IDs = ['*']
+    options.name_languages = ['*']
+    options.name_legacy = True
+    options.layout_features = ['*']
+    options.notdef_outline = True
+
+    try:
+        font = subset.load_font(fontfile, options)
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(unicodes=codepoints)
+        subsetter.subset(font)
+        subset.save_font(font, path, options)
+    except Exception as e:
+        return str(e)
+    return None
+
+def subset_path(directory, font, taken):
+    """Return the path in directory to write the subset of font to, or None if the
+    font has no usable file name. Paths already in taken are avoided and added to it."""
+    # attachment names come from the Matroska file and may contain directories
+    name = os.path.basename(font.name)
+    stem, ext = os.path.splitext(name)
+    if stem.strip(".") == "":
+        return None
+    if font.num_fonts > 1:
+        # faces of font collections are written as separate fonts
+        stem, ext = f"{stem}-{font.font_number}", ".otf" if font.postscript else ".ttf"
+
+    path = os.path.join(directory, stem + ext)
+    suffix = 1
+    while os.path.normcase(path) in taken:
+        suffix += 1
+        path = os.path.join(directory, f"{stem}-{suffix}{ext}")
+    taken.add(os.path.normcase(path))
+    return path
+
+def audit_main():
+    parser = argparse.ArgumentParser(
+        description="Report which characters of each font are used by the subtitles in a muxed "
+                    "Matroska file or an ASS file, and which fonts are not used at all.")
+    parser.add_argument('subtitles', help="""
+File containing the subtitles to audit. May be a Matroska file or an ASS file.
+If a Matroska file is provided, any attached fonts will be audited.
+""")
+    parser.add_argument('additional_fonts', nargs='*', help="""
+List of additional fonts to audit.
+May be a Matroska file with fonts attached, a directory containing font files, or a single font file.
+""")
+    parser.add_argument('--subset', metavar='DIR', help="""
+Write copies of the used fonts containing only the glyphs needed for the
+characters used to the given directory, using N processes if --jobs is given.
+""")
+    add_common_arguments(parser)
+    args = parser.parse_args()
+
+    schema = ebmlite.loadSchema("matroska.xml")
+    writer, output = structured_output(args)
+
+    with output:
+        subtitles, attachments = read_subtitles(args.subtitles, schema, args.stream_mkv)
+        additional = read_font_sources(args.additional_fonts, schema, args.stream_mkv)
+
+        fonts = FontCollection(attachments + additional,
+                               FontIndex(args.font_index) if args.font_index else None,
+                               jobs=args.jobs, lazy=not args.eager_fonts)
+        used = collections.defaultdict(set)
+        for name, doc in subtitles:
+            print(f"Auditing track {name}")
+            report = check_fonts(doc, fonts, args.ignore_drawings, args.warn_fullname_mismatch,
+                                 jobs=args.jobs)
+            for font, chars in report["used_chars"].items():
+                # missing glyphs are reported by the validator instead
+                used[font].update(chars if font.charset is None else chars & font.charset)
+
+        used_faces = [font for font in fonts.fonts if font in used]
+        used_files = {id(font.fontfile) for font in used_faces}
+        # shared font sources always contain fonts a given file does not use,
+        # so only unused attachments count as an issue
+        unused = [name for name, fontfile in attachments if id(fontfile) not in used_files]
+        unused_additional = [name for name, fontfile in additional if id(fontfile) not in used_files]
+
+        if writer is not None:
+            writer.write({"file": args.subtitles,
+                          "fonts": [{"file": font.name, "index": font.font_number,
+                                     "codepoints": sorted(map(ord, used[font])),
+                                     "available": None if font.charset is None else len(font.charset)}
+                                    for font in used_faces],
+                          "unused": unused,
+                          "unused_additional": unused_additional})
+            writer.close()
+        else:
+            print("Used fonts:")
+            for font in used_faces:
+                available = "" if font.charset is None else f" of {len(font.charset)}"
+                print(f"- {font.name} (face {font.font_number}): "
+                      f"{len(used[font])}{available} character(s) used")
+            print("Unused fonts:")
+            for name in unused:
+                print(f"- {name}")
+            if additional:
+                print("Unused fonts from additional sources:")
+                for name in unused_additional:
+                    print(f"- {name}")
+
+        if args.subset:
+            os.makedirs(args.subset, exist_ok=True)
+            taken = set()
+            paths = [subset_path(args.subset, font, taken) for font in used_faces]
+            # keep the space so that fonts with none of the used characters
+            # still have a character map
+            tasks = [(font.fontfile, font.font_number, sorted(map(ord, used[font] | {' '})), path)
+                     for font, path in zip(used_faces, paths) if path is not None]
+            if args.jobs > 1 and len(tasks) > 1:
+                with concurrent.futures.ProcessPoolExecutor(args.jobs) as executor:
+                    errors = list(executor.map(subset_font, *zip(*tasks)))
+            else:
+                errors = [subset_font(*task) for task in tasks]
+
+            errors = iter(errors)
+            for font, path in zip(used_faces, paths):
+                if path is None:
+                    print(f"Error subsetting {font.name}: invalid file name")
+                elif (error := next(errors)) is not None:
+                    print(f"Error subsetting {font.name}: {error}")
+                else:
+                    print(f"Wrote {path}")
+
+    return len(unused) > 0
+
 if __name__ == "__main__":
     sys.exit(main())
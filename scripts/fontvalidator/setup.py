@@ -6,6 +6,10 @@ setup(
     py_modules=['fontvalidator'],
     install_requires=['ass', 'fonttools', 'ebmlite'],
     entry_points={
-        "console_scripts": ["fontvalidator=fontvalidator:main"]
+        "console_scripts": [
+            "fontvalidator=fontvalidator:main",
+            "fontvalidator-batch=fontvalidator:batch_main",
+            "fontvalidator-audit=fontvalidator:audit_main"
+        ]
     }
 )
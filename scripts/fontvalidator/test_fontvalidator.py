@@ -0,0 +1,172 @@
+import contextlib
+import io
+import random
+import re
+
+import ass
+import pytest
+
+import benchmark
+import fontvalidator
+from fontvalidator import State, parse_int, strip_fontname
+
+# the override tag parser as it was before the tag names were classified
+# in TAG_PATTERN, used as a reference for the current one
+OLD_TAG_PATTERN = re.compile(r"\\\s*([^(\\]+)(?<!\s)\s*(?:\(\s*([^)]+)(?<!\s)\s*)?")
+
+def old_parse_tags(s, state, line_style, styles):
+    for match in OLD_TAG_PATTERN.finditer(s):
+        value, paren = match.groups()
+
+        def get_tag(name, *exclude):
+            if value.startswith(name) and not any(value.startswith(ex) for ex in exclude):
+                args = []
+                if paren is not None:
+                    args.append(paren)
+                if len(stripped := value[len(name):].lstrip()) > 0:
+                    args.append(stripped)
+                return args
+            else:
+                return None
+
+
+        if (args := get_tag("fn")) is not None:
+            if len(args) == 0:
+                font = line_style.font
+            else:
+                font = strip_fontname(args[0])
+            state = state._replace(font=font)
+        elif (args := get_tag("b", "blur", "be", "bord")) is not None:
+            weight = None if len(args) == 0 else parse_int(args[0])
+            if weight is None:
+                transformed = None
+            elif weight == 0:
+                transformed = 400
+            elif weight in (1, -1):
+                transformed = 700
+            elif 100 <= weight <= 900:
+                transformed = weight
+            else:
+                transformed = None
+
+            state = state._replace(weight=transformed or line_style.weight)
+        elif (args := get_tag("i", "iclip")) is not None:
+            slant = None if len(args) == 0 else parse_int(args[0])
+            state = state._replace(italic=slant == 1 if slant in (0, 1) else line_style.italic)
+        elif (args := get_tag("p", "pos", "pbo")) is not None:
+            scale = 0 if len(args) == 0 else parse_int(args[0])
+            state = state._replace(drawing=scale != 0)
+        elif (args := get_tag("r")) is not None:
+            if len(args) == 0:
+                style = line_style
+            else:
+                if (style := styles.get(args[0])) is None:
+                    print(rf"Warning: \r argument {args[0]} does not exist; defaulting to line style")
+                    style = line_style
+            state = state._replace(font=style.font, italic=style.italic, weight=style.weight)
+        elif (args := get_tag("t")) is not None:
+            if len(args) > 0:
+                state = old_parse_tags(args[0], state, line_style, styles)
+
+    return state
+
+
+STYLES = {
+    "Default": State("Arial", False, 400, False),
+    "Alt": State("@Meiryo", True, 700, False),
+    "Sign Bold": State("Test Sans", False, 900, False),
+}
+
+# pieces that tend to form tags on their own or run into each other
+FRAGMENTS = [
+    "\\", "\\", "\\", " ", "  ", "\t", "(", ")", ",", "&", "H", "-", "+",
+    "0", "1", "-1", "2", "100", "700", "950", "12.5",
+    "fn", "b", "blur", "be", "bord", "i", "iclip", "p", "pos", "pbo", "r", "t",
+    "fs", "an", "c", "1c", "k", "move", "clip", "fad", "org", "xbord",
+    "Arial", "@Arial", "Test Sans", "Default", "Alt", "Sign Bold", "Missing", "m 0 0 l 1 1",
+]
+
+def random_tags(rng):
+    return "".join(rng.choice(FRAGMENTS) for _ in range(rng.randrange(1, 25)))
+
+def check_same(s, state, line_style):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        expected = old_parse_tags(s, state, line_style, STYLES)
+    expected_warnings = output.getvalue().splitlines()
+
+    warnings = []
+    actual = fontvalidator.parse_tags(s, state, line_style, STYLES, warnings)
+    assert (actual, warnings) == (expected, expected_warnings), repr(s)
+
+
+@pytest.mark.parametrize("s", [
+    r"\fnArial", r"\fn@Meiryo", r"\fn", r"\fn Test Sans ", r"\ fn  Arial",
+    r"\b1", r"\b0", r"\b-1", r"\b700", r"\b950", r"\b", r"\b(1)", r"\blur2", r"\be1", r"\bord3",
+    r"\i1", r"\i0", r"\i2", r"\i", r"\iclip(0,0,1,1)",
+    r"\p1", r"\p0", r"\p", r"\pos(1,2)", r"\pbo5",
+    r"\rAlt", r"\r", r"\rMissing", r"\r Sign Bold",
+    r"\t(\b1\i1)", r"\t(0,100,\fnArial)", r"\t", r"\t()", r"\t(\rMissing)",
+    r"\fnArial\b1\i1\p1", r"\\\\", r"\ ", r"\fn(Arial)", r"\b1 \i1", r"no tags here",
+])
+def test_parse_tags_examples(s):
+    check_same(s, STYLES["Default"], STYLES["Default"])
+    check_same(s, STYLES["Alt"]._replace(drawing=True), STYLES["Sign Bold"])
+
+def test_parse_tags_fuzz():
+    rng = random.Random(0)
+    states = list(STYLES.values()) + [State("Arial", True, 700, True)]
+    for _ in range(20000):
+        check_same(random_tags(rng), rng.choice(states), rng.choice(list(STYLES.values())))
+
+
+def run(func, *args):
+    """Return the result of a call and what it printed."""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        result = func(*args)
+    return result, output.getvalue()
+
+def test_watch_matches_full_check(tmp_path):
+    rng = random.Random(0)
+    families = benchmark.make_font_dir(tmp_path, 8, rng)
+    fonts = fontvalidator.FontCollection((p.name, str(p)) for p in tmp_path.iterdir())
+    header, events, _ = benchmark.make_script("typesetting", 200, families, rng)
+    header = header.split("\n") + ["[Events]", "Format: Layer, Start, End, Style, Name, "
+                                   "MarginL, MarginR, MarginV, Effect, Text"]
+    pool = [f"Dialogue: {layer},{start},{end},{style},,0,0,0,,{text}"
+            for layer, start, end, style, text in events]
+    pool += ["Comment: 0,0:00:00.00,0:00:01.00,Default,,0,0,0,,{\\fnMissing}x",
+             "Dialogue: 0,0:00:00.00,0:00:01.00,Unknown,,0,0,0,,x",
+             "Dialogue: 0,0:00:00.00,0:00:01.00,Default,,0,0,0,,{\\rUnknown}\u2603",
+             "Format: Layer, Start, End, Style, Actor, MarginL, MarginR, MarginV, Effect, Text",
+             "", "; comment"]
+
+    parse = fontvalidator.CachingParser()
+    checker = fontvalidator.IncrementalChecker(fonts)
+    lines = pool[:100]
+    for step in range(200):
+        i = rng.randrange(len(lines) + 1)
+        action = rng.random()
+        if action < 0.3:
+            lines[i:i] = rng.sample(pool, rng.randint(1, 3))
+        elif action < 0.6:
+            del lines[i:i + rng.randint(1, 3)]
+        elif action < 0.9 and lines:
+            lines[min(i, len(lines) - 1)] = rng.choice(pool)
+        elif action < 0.95:
+            lines = lines[:len(lines) // 2]
+        else:
+            lines = pool[:100]
+
+        text = "\n".join(header + lines)
+        doc = parse(io.StringIO(text))
+        expected_doc = ass.parse(io.StringIO(text))
+        assert [line.dump_with_type() for line in doc.events] == \
+            [line.dump_with_type() for line in expected_doc.events]
+
+        report, output = run(checker.check, doc)
+        expected, expected_output = run(fontvalidator.check_fonts, expected_doc, fonts)
+        assert output == expected_output
+        assert fontvalidator.report_issues(report) == fontvalidator.report_issues(expected)
+        assert dict(report["used_chars"]) == dict(expected["used_chars"])
@@ -3,10 +3,15 @@ from __future__ import annotations
 import argparse
 import codecs
 import collections
+import collections.abc
+import concurrent.futures
 import datetime
 import inspect
 import io
+import itertools
 import logging
+import operator
+import os
 import pathlib
 import re
 import sys
@@ -24,6 +29,12 @@ def filter(f):
     f._filter = True
     return f
 
+# filters that only read and modify each event line on its own,
+# and can therefore be applied to a file a chunk of lines at a time
+def per_line(f):
+    f._per_line = True
+    return f
+
 def action_factory(types):
     class ParseChain(argparse.Action):
 
@@ -79,12 +90,253 @@ def generate_argument(group, f):
     group.add_argument(flag_name, nargs=nargs, default=default, help=doc,
                        metavar=metavar, action=action_factory(types))
 
+_MISSING = object()
+_INTERNED_FIELDS = ("Style", "Name", "Effect")
+
+class _RowFields(collections.abc.MutableMapping):
+    """The fields dict of a line stored in an EventColumns,
+    reading and writing the columns directly."""
+    __slots__ = ("storage", "row")
+
+    def __init__(self, storage, row):
+        self.storage = storage
+        self.row = row
+
+    def __getitem__(self, name):
+        value = self.storage.columns[name][self.row]
+        if value is _MISSING:
+            raise KeyError(name)
+        return value
+
+    def __setitem__(self, name, value):
+        self.storage.column_for(name)[self.row] = value
+
+    def __delitem__(self, name):
+        self[name]
+        self.storage.column_for(name)[self.row] = _MISSING
+        self.storage.sparse.add(name)
+
+    def __iter__(self):
+        return (name for name, column in self.storage.columns.items()
+                if column[self.row] is not _MISSING)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+class _ColumnStorage:
+    """Field values of all lines ever added to a group of EventColumns, by row number."""
+
+    def __init__(self):
+        self.columns = {}
+        self.classes = []
+        self.types = []
+        # columns that have _MISSING values
+        self.sparse = set()
+
+    def column_for(self, name):
+        column = self.columns.get(name)
+        if column is None:
+            column = self.columns[name] = [_MISSING] * len(self.classes)
+            if self.classes:
+                self.sparse.add(name)
+        return column
+
+    def add(self, line):
+        row = len(self.classes)
+        fields = line.fields
+        columns = self.columns
+        if fields.keys() == columns.keys():
+            for name, value in fields.items():
+                columns[name].append(value)
+        else:
+            for name, column in columns.items():
+                column.append(fields.get(name, _MISSING))
+            for name, value in fields.items():
+                column = self.column_for(name)
+                if len(column) == row:
+                    # not yet present in the storage when the loop above ran
+                    column.append(value)
+            if len(fields) < len(columns):
+                self.sparse.update(name for name in columns if name not in fields)
+        # share the strings of fields that repeat a lot
+        for name in _INTERNED_FIELDS:
+            value = fields.get(name)
+            if isinstance(value, str):
+                columns[name][row] = sys.intern(value)
+        self.classes.append(type(line))
+        self.types.append(line.TYPE)
+        return row
+
+class EventColumns(collections.abc.MutableSequence):
+    """A list of events storing each field as a column, for fast scans of
+    single fields on large files. Indexing returns regular ass line objects
+    whose fields are read from and written to the columns, and assigning
+    such a line to another position moves it without copying."""
+
+    def __init__(self, lines=(), storage=None):
+        self.storage = _ColumnStorage() if storage is None else storage
+        self.rows = []
+        self.extend(lines)
+
+    def derive(self, lines):
+        """Create an EventColumns from the given lines, sharing the storage with this one."""
+        return EventColumns(lines, self.storage)
+
+    def _row_of(self, line):
+        fields = getattr(line, "fields", None)
+        if isinstance(fields, _RowFields) and fields.storage is self.storage:
+            return fields.row
+        return self.storage.add(line)
+
+    def _line(self, row):
+        storage = self.storage
+        cls = storage.classes[row]
+        line = cls.__new__(cls)
+        line.fields = _RowFields(storage, row)
+        if storage.types[row] != cls.TYPE:
+            line.TYPE = storage.types[row]
+        return line
+
+    def materialize(self):
+        """Return the lines as regular ass line objects independent of the columns."""
+        storage = self.storage
+        names = list(storage.columns)
+        values = zip(*(map(column.__getitem__, self.rows) for column in storage.columns.values()))
+        lines = []
+        for row, row_values in zip(self.rows, values):
+            cls = storage.classes[row]
+            line = cls.__new__(cls)
+            line.fields = dict(zip(names, row_values))
+            if storage.sparse:
+                line.fields = {k: v for k, v in line.fields.items() if v is not _MISSING}
+            if storage.types[row] != cls.TYPE:
+                line.TYPE = storage.types[row]
+            lines.append(line)
+        return lines
+
+    def column(self, field):
+        """Return the values of the given attribute (e.g. text, or TYPE) of all lines, in order."""
+        storage = self.storage
+        if field == "TYPE":
+            return list(map(storage.types.__getitem__, self.rows))
+
+        descriptor = getattr(ass.Dialogue, field, None)
+        if not isinstance(descriptor, ass.data._Field):
+            return [getattr(line, field) for line in self]
+
+        column = storage.columns.get(descriptor.name)
+        if column is None:
+            return [descriptor.default] * len(self.rows)
+        values = list(map(column.__getitem__, self.rows))
+        if descriptor.name in storage.sparse:
+            values = [descriptor.default if value is _MISSING else value for value in values]
+        return values
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._line(row) for row in self.rows[index]]
+        return self._line(self.rows[index])
+
+    def __setitem__(self, index, line):
+        if isinstance(index, slice):
+            self.rows[index] = [self._row_of(l) for l in line]
+        else:
+            self.rows[index] = self._row_of(line)
+
+    def __delitem__(self, index):
+        del self.rows[index]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return map(self._line, self.rows)
+
+    def insert(self, index, line):
+        self.rows.insert(index, self._row_of(line))
+
+    def append(self, line):
+        self.rows.append(self._row_of(line))
+
+    def extend(self, lines):
+        self.rows.extend(self._row_of(line) for line in lines)
+
+class _ColumnarDocument(ass.Document):
+    """A document whose events are stored in an EventColumns as they are parsed,
+    so the parsed line objects don't all have to be kept around at once."""
+
+    def __init__(self):
+        super().__init__()
+        self.events.set_data(EventColumns())
+
+def _parse_file(path):
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        return ass.parse(f)
+
+_INVERT = bytes.maketrans(b"\0\1", b"\1\0")
+
+class Selection:
+    """An ordered set of line indices, stored as a mask with one byte per line.
+    Lines past the end of the mask are not selected."""
+    __slots__ = ("mask", "_count")
+
+    def __init__(self, mask=b""):
+        self.mask = bytes(mask)
+        self._count = None
+
+    @classmethod
+    def span(cls, start, stop):
+        """Select the lines from start up to, but not including, stop."""
+        return cls(bytes(start) + b"\1" * (stop - start))
+
+    def _combine(self, other, op):
+        size = max(len(self.mask), len(other.mask))
+        value = op(int.from_bytes(self.mask, "little"), int.from_bytes(other.mask, "little"))
+        return Selection(value.to_bytes(size, "little"))
+
+    def __or__(self, other):
+        return self._combine(other, operator.or_)
+
+    def __and__(self, other):
+        return self._combine(other, operator.and_)
+
+    def __sub__(self, other):
+        return self._combine(other, lambda a, b: a & ~b)
+
+    def select(self, lines):
+        """Return the selected lines out of the given lines."""
+        return list(itertools.compress(lines, self.mask))
+
+    def reject(self, lines):
+        """Return the lines that are not selected out of the given lines."""
+        mask = self.mask.translate(_INVERT)
+        if len(mask) < len(lines):
+            mask += b"\1" * (len(lines) - len(mask))
+        return list(itertools.compress(lines, mask))
+
+    def __contains__(self, index):
+        return 0 <= index < len(self.mask) and self.mask[index] == 1
+
+    def __iter__(self):
+        return itertools.compress(itertools.count(), self.mask)
+
+    def __len__(self):
+        if self._count is None:
+            self._count = self.mask.count(1)
+        return self._count
+
+    def __repr__(self):
+        return f"Selection({set(self)!r})"
+
 @filter_group
 class Subtitles:
 
-    def __init__(self, sub_file, filename):
+    def __init__(self, sub_file, filename, columnar=False, jobs=1):
         self.sub_file = sub_file
         self.filename = filename
+        self._jobs = jobs
+        if columnar and not isinstance(self.sub_file.events._lines, EventColumns):
+            self.sub_file.events = EventColumns(self.sub_file.events)
         self.section = "events"
         self.selection_clear()
         self._fps = 24000 / 1001
@@ -97,43 +349,62 @@ class Subtitles:
             "millis": lambda t: datetime.timedelta(milliseconds=t),
             "frames": lambda t: datetime.timedelta(seconds=t / self._fps)
         }
+        self._expressions = {}
 
     def _set_section(self, lines):
-        setattr(self.sub_file, self.section, lines)
+        if self.section == "events":
+            self._set_events(lines)
+        else:
+            setattr(self.sub_file, self.section, lines)
+
+    def _set_events(self, lines):
+        current = self.sub_file.events._lines
+        if isinstance(current, EventColumns) and isinstance(lines, list):
+            lines = current.derive(lines)
+        self.sub_file.events = lines
 
     def _get_section(self):
         return getattr(self.sub_file, self.section)
 
     def _find_matching_lines(self, field, pattern):
-        selection = {i for i, line in enumerate(self._get_section())
-                     if re.search(pattern, getattr(line, field))}
-        return selection
+        lines = self._get_section()._lines
+        if isinstance(lines, EventColumns):
+            values = lines.column(field)
+        else:
+            values = (getattr(line, field) for line in lines)
+        return Selection(map(bool, map(re.compile(pattern).search, values)))
+
+    def _compile_expr(self, expr):
+        """Compile expr into a function of the line _, with the helpers as closure variables."""
+        func = self._expressions.get(expr)
+        if func is None:
+            # check that expr is an expression on its own
+            compile(expr, '<string>', 'eval')
+            source = f"lambda {', '.join(self._helpers)}: lambda _: ({expr}\n)"
+            make_func = eval(compile(source, '<string>', 'eval'), globals())
+            func = self._expressions[expr] = make_func(**self._helpers)
+        return func
 
     def _find_line_expr(self, expr):
-        expr_c = compile(expr, '<string>', 'eval')
-        selection = {i for i, line in enumerate(self._get_section())
-                     if eval(expr_c, None, {"_": line, **self._helpers})}
-        return selection
+        return Selection(map(bool, map(self._compile_expr(expr), self._get_section())))
 
     def _get_selection(self):
         if self.selection is None:
             return self._get_section()
 
-        return [line for i, line in enumerate(self._get_section())
-                if i in self.selection]
+        return self.selection.select(self._get_section())
 
     def _get_nonselection(self):
         if self.selection is None:
             return []
 
-        return [line for i, line in enumerate(self._get_section())
-                if i not in self.selection]
+        return self.selection.reject(self._get_section())
 
     def _process_selection(self, f):
         if self.selection is None:
             f(self._get_section())
         else:
-            indices = sorted(self.selection)
+            indices = list(self.selection)
             lines = self._get_selection()
             f(lines)
             section = self._get_section()
@@ -148,6 +419,7 @@ class Subtitles:
         return self
 
     @filter
+    @per_line
     def use_events(self) -> Subtitles:
         """Set the current section to the events section."""
         self.section = "events"
@@ -164,7 +436,7 @@ class Subtitles:
 
     def _subtract_selection(self, lines):
         cur_selection = (self.selection if self.selection is not None
-                         else set(range(len(self._get_section()))))
+                         else Selection.span(0, len(self._get_section())))
         self.selection = cur_selection - lines
 
     def _intersect_selection(self, lines):
@@ -175,6 +447,7 @@ class Subtitles:
 
 
     @filter
+    @per_line
     def selection_set(self, field: str, pattern: str) -> Subtitles:
         """Set the selection to all lines in the current section
         for which the given field matches the given regex pattern."""
@@ -182,6 +455,7 @@ class Subtitles:
         return self
 
     @filter
+    @per_line
     def selection_add(self, field: str, pattern: str) -> Subtitles:
         """Set the selection to the union of the current selection
         and all lines in the current section for which the given
@@ -190,6 +464,7 @@ class Subtitles:
         return self
 
     @filter
+    @per_line
     def selection_subtract(self, field: str, pattern: str) -> Subtitles:
         """Set the selection to the current selection, minus all lines
         in the current section for which the given field matches
@@ -198,6 +473,7 @@ class Subtitles:
         return self
 
     @filter
+    @per_line
     def selection_intersect(self, field: str, pattern: str) -> Subtitles:
         """Set the selection to the intersection of the current selection
         and all lines in the current section for which the given field
@@ -206,6 +482,7 @@ class Subtitles:
         return self
 
     @filter
+    @per_line
     def selection_set_expr(self, expr: str) -> Subtitles:
         """Set the selection to the lines in the current section for which
         expr returns true."""
@@ -213,6 +490,7 @@ class Subtitles:
         return self
 
     @filter
+    @per_line
     def selection_add_expr(self, expr: str) -> Subtitles:
         """Set the selection to the union of the current selection
         and all lines in the current section for which
@@ -221,6 +499,7 @@ class Subtitles:
         return self
 
     @filter
+    @per_line
     def selection_subtract_expr(self, expr: str) -> Subtitles:
         """Set the selection to the current selection, minus all lines
         in the current section for which expr returns true."""
@@ -228,6 +507,7 @@ class Subtitles:
         return self
 
     @filter
+    @per_line
     def selection_intersect_expr(self, expr: str) -> Subtitles:
         """Set the selection to the intersection of the current selection
         and all lines in the current section for which expr returns true."""
@@ -235,12 +515,14 @@ class Subtitles:
         return self
 
     @filter
+    @per_line
     def selection_clear(self) -> Subtitles:
         """Reset the selection (select all lines)."""
         self.selection = None
         return self
 
     @filter
+    @per_line
     def keep_selected(self) -> Subtitles:
         """Remove all lines not in the current selection. Clears the selection."""
         self._set_section(self._get_selection())
@@ -248,6 +530,7 @@ class Subtitles:
         return self
 
     @filter
+    @per_line
     def remove_selected(self) -> Subtitles:
         """Remove all lines in the current selection. Clears the selection."""
         self._set_section(self._get_nonselection())
@@ -261,10 +544,10 @@ class Subtitles:
         nonselection = self._get_nonselection()
         if position == "TOP":
             self._set_section(selection + nonselection)
-            self.selection = set(range(len(selection)))
+            self.selection = Selection.span(0, len(selection))
         else:
             self._set_section(nonselection + selection)
-            self.selection = set(range(len(nonselection), len(nonselection) + len(selection)))
+            self.selection = Selection.span(len(nonselection), len(nonselection) + len(selection))
         return self
 
     @filter
@@ -281,18 +564,26 @@ class Subtitles:
             self.sub_file.styles.append(style)
         return self
 
-    def _import_file(self, imp_definition, styles, events, fields):
+    def _import_name(self, imp_definition):
         # strip extradata info
-        fname = re.sub(r"^\{=\d+(,\d+)*\}", "", imp_definition.text)
+        return re.sub(r"^\{=\d+(,\d+)*\}", "", imp_definition.text)
+
+    def _parse_imports(self, imp_definitions):
+        paths = [pathlib.Path(self.filename).parent / self._import_name(imp_definition)
+                 for imp_definition in imp_definitions]
+        if self._jobs <= 1 or len(paths) <= 1:
+            return [_parse_file(path) for path in paths]
+
+        with concurrent.futures.ProcessPoolExecutor(min(self._jobs, len(paths))) as executor:
+            return list(executor.map(_parse_file, paths))
+
+    def _import_file(self, imp_definition, imp, styles, events, fields):
+        fname = self._import_name(imp_definition)
         shifted = imp_definition.effect == 'import-shifted'
 
         self._ms_count += 1
         self._ms_files[self._ms_count] = fname
 
-        path = pathlib.Path(self.filename).parent / fname
-        with path.open(encoding='utf-8-sig') as f:
-            imp = ass.parse(f)
-
         if shifted:
             try:
                 sync_line = next(line for line in imp.events
@@ -331,16 +622,20 @@ class Subtitles:
         events = []
         fields = {}
 
-        for line in self.sub_file.events:
-            if re.match(r'\d+\$', line.style):
-                continue
-            if line.effect in ('import', 'import-shifted') and \
-                    (field is None or re.search(pattern, getattr(line, field))):
-                self._import_file(line, styles, events, fields)
+        lines = [line for line in self.sub_file.events if not re.match(r'\d+\$', line.style)]
+        is_import = [line.effect in ('import', 'import-shifted') and
+                     (field is None or re.search(pattern, getattr(line, field)))
+                     for line in lines]
+
+        # parse all files up front (in parallel if enabled), then import them in order
+        imports = iter(self._parse_imports(list(itertools.compress(lines, is_import))))
+        for line, imp in zip(lines, is_import):
+            if imp:
+                self._import_file(line, next(imports), styles, events, fields)
             else:
                 events.append(line)
 
-        self.sub_file.events = events
+        self._set_events(events)
         self.sub_file.styles = list(styles.values())
         self.sub_file.fields = fields
 
@@ -413,14 +708,13 @@ class Subtitles:
         """Sort all lines in the current selection based on the return value of expr,
         either ascending or descending."""
         def _sort(events):
-            expr_c = compile(expr, '<string>', 'eval')
-            events.sort(key=lambda line: eval(expr_c, None, {"_": line, **self._helpers}),
-                        reverse=order == "DESC")
+            events.sort(key=self._compile_expr(expr), reverse=order == "DESC")
             return events
         self._process_selection(_sort)
         return self
 
     @filter
+    @per_line
     def modify_field(self, field: str, pattern: str, replace: str) -> Subtitles:
         """Replace occurrences of pattern with the given replacement string
         in the given field on all lines in the current selection.
@@ -435,33 +729,36 @@ class Subtitles:
         return self
 
     @filter
+    @per_line
     def modify_expr(self, field: str, expr: str) -> Subtitles:
         """Replace the value of the given field on all lines in the selection
         with the result of the given expression."""
         def _modify(lines):
-            expr_c = compile(expr, '<string>', 'eval')
-            for line in lines:
-                cur_val = getattr(line, field)
-                val = eval(expr_c, None, {"_": line, **self._helpers})
+            values = list(map(self._compile_expr(expr), lines))
+            for line, val in zip(lines, values):
+                # fail on unknown fields rather than adding attributes
+                getattr(line, field)
                 setattr(line, field, val)
         self._process_selection(_modify)
         return self
 
     @filter
+    @per_line
     def shift(self, expr: str) -> Subtitles:
         """Shifts the start and end time by a specified amount.
         Example: --shift "secs(-10)".
         """
-        expr_c = compile(expr, '<string>', 'eval')
+        func = self._compile_expr(expr)
         def _modify(lines):
-            for line in lines:
-                time = eval(expr_c, None, {"_": line, **self._helpers})
+            times = list(map(func, lines))
+            for line, time in zip(lines, times):
                 line.start += time
                 line.end += time
         self._process_selection(_modify)
         return self
 
     @filter
+    @per_line
     def remove_all_tags(self) -> Subtitles:
         """Remove all tags (everything in the text field enclosed in {})
         from all dialogue lines. No-op if current section is not
@@ -482,16 +779,18 @@ class Subtitles:
         return self
 
     @filter
+    @per_line
     def remove_comments(self) -> Subtitles:
         """Removes all commented lines in current selection.
         Clears the selection if the current selection is the events section."""
-        self.sub_file.events = [event for event in self.sub_file.events
-                                if event.TYPE != "Comment"]
+        self._set_events([event for event in self.sub_file.events
+                          if event.TYPE != "Comment"])
         if self.section == "events":
             self.selection_clear()
         return self
 
     @filter
+    @per_line
     def get_field(self, field: str) -> Text:
         """Returns the given field from all lines in the current selection as text,
         newline separated."""
@@ -499,6 +798,7 @@ class Subtitles:
         return Text("".join(str(getattr(line, field)) + "\n" for line in selection))
 
     @filter
+    @per_line
     def fps(self, fps: str) -> Subtitles:
         """Set the fps to use for the frames() function. Default is 24000/1001."""
         self._fps = eval(fps)
@@ -510,10 +810,17 @@ class Subtitles:
         return self
 
     def __str__(self):
+        events = self.sub_file.events._lines
+        if isinstance(events, EventColumns):
+            # dumping reads every field, which is faster from plain line objects
+            self.sub_file.events = events.materialize()
         sio = io.StringIO()
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore", UserWarning)
-            self.sub_file.dump_file(sio)
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", UserWarning)
+                self.sub_file.dump_file(sio)
+        finally:
+            self.sub_file.events = events
         return sio.getvalue()
 
     def __getattr__(self, name):
@@ -528,6 +835,126 @@ class Text:
     def __str__(self):
         return self.text
 
+STREAM_CHUNK_SIZE = 1000
+
+def _section_name(line):
+    """Return the name of the section started by a stripped line, or None."""
+    if line.startswith('[') and line.endswith(']'):
+        return line[1:-1]
+    return None
+
+def can_stream(path):
+    """Check that streaming the file at path gives the same result as parsing it whole:
+    it has an events section, no section appears twice and no Format line follows an event."""
+    seen = set()
+    in_events = seen_event = False
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith(';'):
+                continue
+
+            name = _section_name(line)
+            if name is not None:
+                if name.lower() in seen:
+                    return False
+                seen.add(name.lower())
+                in_events = name.lower() == "events"
+            elif in_events and ':' in line:
+                if line.partition(':')[0].lower() == "format":
+                    if seen_event:
+                        return False
+                else:
+                    seen_event = True
+    return "events" in seen
+
+def _write_sections(out, sections, first=True):
+    for section in sections:
+        if not first:
+            out.write("\n")
+        out.write("".join(line + "\n" for line in section.dump()))
+        first = False
+
+def stream(path, chain, out, chunk_size=STREAM_CHUNK_SIZE):
+    """Apply a chain of per-line filters to the file at path, reading and writing
+    the events a chunk at a time. The output is the same as for the whole file
+    as long as can_stream(path) holds."""
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        head = []
+        for line in f:
+            head.append(line)
+            name = _section_name(line.strip())
+            if name is not None and name.lower() == "events":
+                break
+
+        doc = ass.Document.parse_file(head)
+        events = doc.events
+        before_events = list(itertools.takewhile(lambda s: s is not events, doc.sections.values()))
+        subtitles = Subtitles(doc, path)
+        chunks = 0
+        result = None
+
+        def flush():
+            nonlocal chunks, result
+            result = subtitles.use_events()
+            for func, filter_args in chain:
+                result = getattr(result, func)(*filter_args)
+
+            if isinstance(result, Text):
+                out.write(str(result))
+            else:
+                if chunks == 0:
+                    _write_sections(out, before_events)
+                    if before_events:
+                        out.write("\n")
+                    skip = 0
+                else:
+                    # section name and format line
+                    skip = 1 + (events.field_order is not None)
+                out.write("".join(line + "\n" for line in itertools.islice(events.dump(), skip, None)))
+            doc.events = []
+            chunks += 1
+
+        tail = []
+        for line in f:
+            stripped = line.strip()
+            if _section_name(stripped) is not None:
+                tail.append(line)
+                tail.extend(f)
+                break
+            if not stripped or stripped.startswith(';') or ':' not in stripped:
+                continue
+
+            type_name, _, stripped = stripped.partition(':')
+            events.add_line(type_name, stripped.lstrip())
+            if len(events) >= chunk_size:
+                flush()
+
+        if chunks == 0 or len(events) > 0:
+            flush()
+
+    if not isinstance(result, Text):
+        # sections after the events, and default sections missing from the file
+        sections = list(ass.Document.parse_file(head + tail).sections.values())
+        after_events = sections[len(before_events) + 1:]
+        _write_sections(out, after_events, first=False)
+
+def streamable(args, chain):
+    """Check whether --stream can be used with the given arguments, warning if not."""
+    blocking = [func for func, _ in chain
+                if not getattr(getattr(Subtitles, func), '_per_line', False)]
+    if args.input is None or args.input == '-':
+        reason = "when reading from stdin"
+    elif blocking:
+        reason = f"with --{blocking[0].replace('_', '-')}"
+    elif not can_stream(args.input):
+        reason = "the layout of this file"
+    else:
+        return True
+
+    print(f"Warning: Cannot stream {reason}; reading the whole file", file=sys.stderr)
+    return False
+
 def main():
     parser = argparse.ArgumentParser()
 
@@ -540,25 +967,45 @@ def main():
     parser.add_argument("-i", "--input", help="Specify input file (default: stdin)")
     parser.add_argument("-o", "--output", help="Specify output file (default: stdout)")
     parser.add_argument("--in-place", action="store_true", help="Perform operations in place")
+    parser.add_argument("--columnar", action="store_true",
+                        help="Store events field by field as they are parsed, to save memory on large files")
+    parser.add_argument("--stream", action="store_true",
+                        help="Read, process and write the events a chunk at a time if all "
+                             "commands work on individual lines, to save memory on large files")
+    parser.add_argument("-j", "--jobs", type=int, default=1, metavar="N",
+                        help="Parse files imported with --ms-import* using N processes (default: 1)")
     args = parser.parse_args()
+    chain = getattr(args, 'chain', [])
 
+    if args.in_place and args.input is not None:
+        args.output = args.input
+
+    if args.stream and streamable(args, chain):
+        if args.output is None or args.output == '-':
+            stream(args.input, chain, codecs.getwriter('utf-8-sig')(sys.stdout.buffer))
+        else:
+            # the output may be the input file
+            tmp_path = f"{args.output}.tmp"
+            with open(tmp_path, 'w', encoding="utf-8-sig") as f:
+                stream(args.input, chain, f)
+            os.replace(tmp_path, args.output)
+        return
+
+    parse = _ColumnarDocument.parse_file if args.columnar else ass.parse
     if args.input is None or args.input == '-':
         filename = None
-        sub_obj = ass.parse(codecs.getreader('utf-8-sig')(sys.stdin.buffer))
+        sub_obj = parse(codecs.getreader('utf-8-sig')(sys.stdin.buffer))
     else:
         filename = args.input
         with open(args.input, 'r', encoding='utf-8-sig') as f:
-            sub_obj = ass.parse(f)
+            sub_obj = parse(f)
 
-    sub_obj = Subtitles(sub_obj, filename)
+    sub_obj = Subtitles(sub_obj, filename, args.columnar, args.jobs)
 
-    for func, filter_args in getattr(args, 'chain', []):
+    for func, filter_args in chain:
         filt = getattr(sub_obj, func)
         sub_obj = filt(*filter_args)
 
-    if args.in_place and args.input is not None:
-        args.output = args.input
-
     if args.output is None or args.output == '-':
         sys.stdout.buffer.write(str(sub_obj).encode('utf-8-sig'))
     else: